@@ -1,6 +1,7 @@
 import os
 import shutil
 
+from document_rag.profiling import IngestProfiler
 from document_rag.rag import RAG
 from document_rag.settings import Settings
 
@@ -19,6 +20,19 @@ if __name__ == "__main__":
         action="store_true",
         help="Show reference texts for each result.",
     )
+    parser.add_argument(
+        "--profile-ingest",
+        action="store_true",
+        help="Profile ingestion of each document (time, memory, slowest and "
+        "expensive pages), and print a report.",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        type=str,
+        default=None,
+        help="If given with --profile-ingest, also save the report as JSON and "
+        "cProfile stats for each document to this directory.",
+    )
     args = parser.parse_args()
 
     for path in args.documents:
@@ -31,8 +45,15 @@ if __name__ == "__main__":
             exit(1)
 
     shutil.rmtree(Settings().DOCUMENT_RAG_VECTOR_DB_CACHE_DIR, ignore_errors=True)
+    profiler = (
+        IngestProfiler(profile_dir=args.profile_dir) if args.profile_ingest else None
+    )
     rag = RAG.from_settings()
-    rag.add_pdf_documents(paths=args.documents, verbose=True)
+    rag.add_pdf_documents(paths=args.documents, verbose=True, profiler=profiler)
+    if profiler is not None:
+        print(profiler.format_report())
+        if args.profile_dir is not None:
+            profiler.save(os.path.join(args.profile_dir, "ingest_profile.json"))
     print("Ingested PDF documents. Please ask your questions.")
 
     while True:
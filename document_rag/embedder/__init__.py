@@ -0,0 +1,26 @@
+from enum import Enum
+from typing import Optional, Union
+
+from document_rag.embedder.base import BaseEmbedder
+
+
+class EmbedderType(str, Enum):
+    FASTEMBED = "fastembed"
+
+
+def load_embedder(
+    type: Union[EmbedderType, str],
+    model: str,
+    batch_size: int = 256,
+    workers: Optional[int] = None,
+) -> BaseEmbedder:
+    if isinstance(type, str):
+        type = EmbedderType(type)
+
+    # fmt: off
+    if type == EmbedderType.FASTEMBED:
+        from document_rag.embedder.fastembed import FastEmbedEmbedder
+        return FastEmbedEmbedder(model=model, batch_size=batch_size, workers=workers)
+    else:
+        raise ValueError(f"Unknown embedder type: {type}")
+    # fmt: on
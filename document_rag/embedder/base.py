@@ -0,0 +1,27 @@
+from abc import abstractmethod
+from typing import Sequence
+
+import numpy as np
+
+
+class BaseEmbedder:
+    # Name of the embedding model.  Vector DBs record this, so that documents and
+    # queries are always embedded with the same model.
+    model: str
+    # Dimension of the embedding vectors.
+    dim: int
+
+    @abstractmethod
+    def embed_documents(
+        self, documents: Sequence[str], verbose: bool = False
+    ) -> np.ndarray:
+        """Embed a sequence of documents into a 2D array of shape (N, dim).
+
+        Args:
+            documents: The document texts to embed.
+            verbose: Whether to display a progress bar.
+        """
+
+    @abstractmethod
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a search query into a 1D array of shape (dim,)."""
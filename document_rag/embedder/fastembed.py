@@ -0,0 +1,58 @@
+from typing import Optional, Sequence
+
+import numpy as np
+from fastembed.embedding import DefaultEmbedding
+from tqdm import tqdm
+
+from document_rag.embedder.base import BaseEmbedder
+
+
+class FastEmbedEmbedder(BaseEmbedder):
+    """Embeds text with a FastEmbed (ONNX) model.
+
+    Args:
+        model: Name of a model supported by FastEmbed.
+        batch_size: Number of documents to embed at once.  Larger batches are
+            faster, but use more memory.
+        workers: Number of data-parallel worker processes.  If None, embed in the
+            current process (using ONNX Runtime's own threading).  If 0, use one
+            worker per CPU core.
+        threads: Number of threads for each ONNX Runtime session.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        batch_size: int = 256,
+        workers: Optional[int] = None,
+        threads: Optional[int] = None,
+    ):
+        supported = {m["model"]: m for m in DefaultEmbedding.list_supported_models()}
+        if model not in supported:
+            raise ValueError(
+                f"Unsupported FastEmbed model: {model}. "
+                f"Supported models: {list(supported.keys())}"
+            )
+
+        self.model = model
+        self.dim = supported[model]["dim"]
+        self.batch_size = batch_size
+        self.workers = workers
+        self.embedding = DefaultEmbedding(model_name=model, threads=threads)
+
+    def embed_documents(
+        self, documents: Sequence[str], verbose: bool = False
+    ) -> np.ndarray:
+        """Embed a sequence of documents into a 2D array of shape (N, dim)."""
+        vectors = self.embedding.passage_embed(
+            documents, batch_size=self.batch_size, parallel=self.workers
+        )
+        progress = tqdm(
+            vectors, total=len(documents), disable=(not verbose), desc="Embedding"
+        )
+        return np.array(list(progress), dtype=np.float32).reshape(-1, self.dim)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a search query into a 1D array of shape (dim,)."""
+        vector = next(iter(self.embedding.query_embed(query)))
+        return np.asarray(vector, dtype=np.float32)
@@ -0,0 +1,108 @@
+"""Save and load precomputed embeddings, so that the (expensive) embedding step can
+run on a separate batch node.  The serving node then only loads the vectors, with
+'BaseVectorDB.add_embeddings' or 'RAG.import_embeddings'.
+"""
+
+import json
+from typing import List, Optional, Sequence, Tuple, TypedDict
+
+import numpy as np
+from tqdm import tqdm
+
+from document_rag.embedder.base import BaseEmbedder
+from document_rag.profiling import IngestProfiler
+from document_rag.types import TextMetadata
+from document_rag.vector_db.base import CHUNK_OVERLAP, CHUNK_SIZE, read_pdf_document
+
+
+class PrecomputedEmbeddings(TypedDict):
+    # Chunks of text and their metadata, in the same order as 'embeddings'.
+    documents: List[Tuple[str, TextMetadata]]
+    embeddings: np.ndarray
+    # Name of the embedding model, which must match the vector DB's model.
+    model: str
+    # Chunk settings that the documents were split with, which must match the
+    # vector DB's chunk settings.
+    chunk_size: int
+    chunk_overlap: int
+
+
+def embed_pdf_documents(
+    paths: Sequence[str],
+    embedder: BaseEmbedder,
+    verbose: bool = False,
+    profiler: Optional[IngestProfiler] = None,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+) -> PrecomputedEmbeddings:
+    """Extract and embed one or more PDF documents, without adding them to a DB.
+    If a 'profiler' is given, each document is extracted and embedded separately,
+    and profiled.  The chunk settings are saved along with the embeddings.
+    """
+    documents: List[Tuple[str, TextMetadata]] = []
+    if profiler is not None:
+        vectors: List[np.ndarray] = []
+        for path in tqdm(paths, disable=(not verbose), desc="Embedding PDFs"):
+            with profiler.profile_file(path):
+                chunks = read_pdf_document(
+                    path,
+                    chunk_size=chunk_size,
+                    chunk_overlap=chunk_overlap,
+                    profiler=profiler,
+                )
+                with profiler.stage("embed"):
+                    vectors.append(
+                        embedder.embed_documents([text for text, _ in chunks])
+                    )
+            documents += chunks
+        embeddings = np.concatenate(
+            vectors or [np.zeros((0, embedder.dim), dtype=np.float32)]
+        )
+    else:
+        for path in tqdm(paths, disable=(not verbose), desc="Extracting PDFs"):
+            documents += read_pdf_document(
+                path, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+            )
+        embeddings = embedder.embed_documents(
+            [text for text, _ in documents], verbose=verbose
+        )
+
+    return PrecomputedEmbeddings(
+        documents=documents,
+        embeddings=embeddings,
+        model=embedder.model,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+    )
+
+
+def save_embeddings(path: str, precomputed: PrecomputedEmbeddings) -> None:
+    """Save precomputed embeddings to a '.npz' file."""
+    np.savez(
+        path,
+        embeddings=precomputed["embeddings"],
+        # Stored as JSON strings, so that loading doesn't require pickle.
+        documents=np.array(json.dumps(precomputed["documents"])),
+        model=np.array(precomputed["model"]),
+        chunk_size=np.array(precomputed["chunk_size"]),
+        chunk_overlap=np.array(precomputed["chunk_overlap"]),
+    )
+
+
+def load_embeddings(path: str) -> PrecomputedEmbeddings:
+    """Load precomputed embeddings from a '.npz' file (see 'save_embeddings')."""
+    with np.load(path) as data:
+        documents = [
+            (
+                text,
+                TextMetadata(path=meta["path"], page_range=tuple(meta["page_range"])),
+            )
+            for text, meta in json.loads(str(data["documents"]))
+        ]
+        return PrecomputedEmbeddings(
+            documents=documents,  # type: ignore
+            embeddings=data["embeddings"],
+            model=str(data["model"]),
+            chunk_size=int(data["chunk_size"]),
+            chunk_overlap=int(data["chunk_overlap"]),
+        )
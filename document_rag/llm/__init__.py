@@ -1,25 +1,49 @@
 from enum import Enum
-from typing import Union
+from typing import Optional, Union
 
 from document_rag.llm.base import BaseLLM
+from document_rag.settings import Settings
 
 
 class LLMType(str, Enum):
     OPENAI = "openai"
     HUGGINGFACE = "huggingface"
+    FAKE = "fake"
 
 
-def load_llm(type: Union[LLMType, str], model: str) -> BaseLLM:
+def load_llm(
+    type: Union[LLMType, str], model: str, settings: Optional[Settings] = None
+) -> BaseLLM:
+    """Load an LLM backend.  If 'settings' is given, the OpenAI backend takes its
+    API key and transport settings from it, rather than from the environment.
+    """
     if isinstance(type, str):
         type = LLMType(type)
 
     # fmt: off
     if type == LLMType.OPENAI:
         from document_rag.llm.openai import OpenAILLM
-        return OpenAILLM(model=model)
+        if settings is None:
+            return OpenAILLM(model=model)
+        return OpenAILLM(
+            model=model,
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            timeout=settings.DOCUMENT_RAG_LLM_TIMEOUT,
+            max_retries=settings.DOCUMENT_RAG_LLM_MAX_RETRIES,
+            retry_backoff=settings.DOCUMENT_RAG_LLM_RETRY_BACKOFF,
+            max_connections=settings.DOCUMENT_RAG_LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=(
+                settings.DOCUMENT_RAG_LLM_MAX_KEEPALIVE_CONNECTIONS
+            ),
+            keepalive_expiry=settings.DOCUMENT_RAG_LLM_KEEPALIVE_EXPIRY,
+        )
     elif type == LLMType.HUGGINGFACE:
         from document_rag.llm.huggingface import HuggingFaceLLM
         return HuggingFaceLLM(model=model)
+    elif type == LLMType.FAKE:
+        from document_rag.llm.fake import FakeLLM
+        return FakeLLM(model=model)
     else:
         raise ValueError(f"Unknown LLM type: {type}")
     # fmt: on
@@ -1,7 +1,22 @@
 from abc import abstractmethod
+from typing import Iterator, Optional
 
 
 class BaseLLM:
     @abstractmethod
-    def generate(self, prompt: str) -> str:
-        """Generate text from a prompt using the given LLM backend."""
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Generate text from a prompt using the given LLM backend.
+
+        Args:
+            prompt: The input prompt for the LLM.
+            timeout: Maximum time (in seconds) to spend generating a response.  If
+                None, the backend's default behavior is used.
+        """
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """Stream generated text from a prompt, as a sequence of text chunks.
+
+        Backends that don't support streaming yield the full response from
+        'generate' as a single chunk.
+        """
+        yield self.generate(prompt, timeout=timeout)
@@ -0,0 +1,34 @@
+import time
+from typing import Iterator, Optional
+
+from document_rag.llm.base import BaseLLM
+
+
+class FakeLLM(BaseLLM):
+    """Stand-in LLM that returns a canned response after a simulated delay.  Useful
+    for tests and load tests, where we want to exercise the rest of the pipeline
+    without loading model weights or incurring charges from an API.
+    """
+
+    def __init__(
+        self, model: str = "fake", response: str = "UNKNOWN", latency: float = 0.0
+    ):
+        self.model = model
+        self.response = response
+        self.latency = latency
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Return the canned response, after waiting for 'latency' seconds."""
+        latency = self.latency if timeout is None else min(self.latency, timeout)
+        time.sleep(latency)
+        return self.response
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """Stream the canned response word-by-word, spreading 'latency' seconds
+        evenly across the words.
+        """
+        words = self.response.split(" ")
+        latency = self.latency if timeout is None else min(self.latency, timeout)
+        for i, word in enumerate(words):
+            time.sleep(latency / len(words))
+            yield word if i == 0 else f" {word}"
@@ -27,7 +27,9 @@ class HuggingFaceLLM(BaseLLM):
             "text-generation", model=self.model, device_map="auto", token=token
         )
 
-    def generate(self, prompt: str) -> str:
-        """Generate text from a prompt using the OpenAI API."""
-        response = cast(Response, self.pipeline(prompt)[0])
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Generate text from a prompt using the Transformers pipeline.  If 'timeout'
+        is given, generation stops early once that many seconds have elapsed.
+        """
+        response = cast(Response, self.pipeline(prompt, max_time=timeout)[0])
         return response["generated_text"]
@@ -1,12 +1,21 @@
 from enum import Enum
-from typing import List, TypedDict, Union
+from typing import Iterator, List, Optional, TypedDict, Union
 
-from openai import OpenAI
+from openai import (
+    APIConnectionError,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
 
 from document_rag.llm.base import BaseLLM
+from document_rag.llm.transport import SingleFlight, create_http_client, retry
 from document_rag.settings import Settings
 
 SETTINGS = Settings()
+# Errors that are worth retrying.  (NOTE: APITimeoutError is a subclass of
+# APIConnectionError.)  Other errors, like invalid requests, will fail again.
+RETRY_ON = (APIConnectionError, InternalServerError, RateLimitError)
 
 
 class ModelType(str, Enum):
@@ -35,15 +44,56 @@ class Response(TypedDict):
 
 
 class OpenAILLM(BaseLLM):
-    def __init__(self, model: Union[ModelType, str]):
+    """LLM backend for the OpenAI API (or any OpenAI-compatible server).
+
+    Requests go through a shared, explicitly sized connection pool.  Failed requests
+    are retried with jittered backoff, and concurrent calls with identical prompts
+    are coalesced into a single upstream request.  The API key and transport settings
+    default to the OPENAI_* and DOCUMENT_RAG_LLM_* values in Settings.
+    """
+
+    def __init__(
+        self,
+        model: Union[ModelType, str],
+        api_key: Optional[str] = SETTINGS.OPENAI_API_KEY,
+        base_url: Optional[str] = SETTINGS.OPENAI_BASE_URL,
+        timeout: float = SETTINGS.DOCUMENT_RAG_LLM_TIMEOUT,
+        max_retries: int = SETTINGS.DOCUMENT_RAG_LLM_MAX_RETRIES,
+        retry_backoff: float = SETTINGS.DOCUMENT_RAG_LLM_RETRY_BACKOFF,
+        max_connections: int = SETTINGS.DOCUMENT_RAG_LLM_MAX_CONNECTIONS,
+        max_keepalive_connections: int = (
+            SETTINGS.DOCUMENT_RAG_LLM_MAX_KEEPALIVE_CONNECTIONS
+        ),
+        keepalive_expiry: float = SETTINGS.DOCUMENT_RAG_LLM_KEEPALIVE_EXPIRY,
+    ):
         if isinstance(model, str):
             model = ModelType(model)
         self.model = model
-        self.client = OpenAI(api_key=SETTINGS.OPENAI_API_KEY)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=timeout,
+            # Retries are handled by 'retry' below, so that they respect the
+            # overall time limit for each call.
+            max_retries=0,
+            http_client=create_http_client(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+        self._singleflight: SingleFlight[str] = SingleFlight()
+
+    def _client(self, timeout: Optional[float]) -> OpenAI:
+        if timeout is None:
+            return self.client
+        return self.client.with_options(timeout=timeout)
 
-    def generate(self, prompt: str) -> str:
-        """Generate text from a prompt using the OpenAI API."""
-        openai_response = self.client.chat.completions.create(
+    def _create(self, prompt: str, timeout: Optional[float]) -> str:
+        openai_response = self._client(timeout).chat.completions.create(
             model=self.model.value,
             messages=[{"role": "user", "content": prompt}],
         )
@@ -52,3 +102,53 @@ class OpenAILLM(BaseLLM):
             raise ValueError("OpenAI response was empty")
 
         return text
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Generate text from a prompt using the OpenAI API.  The call (including any
+        retries) is aborted after 'timeout' seconds, which defaults to the 'timeout'
+        passed to the constructor.
+
+        NOTE: If a call with the same prompt is already in flight, this waits for
+        and returns its response instead.  If that call doesn't finish within
+        'timeout', this raises TimeoutError.
+        """
+        if timeout is None:
+            timeout = self.timeout
+
+        def complete() -> str:
+            return retry(
+                lambda remaining: self._create(prompt, timeout=remaining),
+                max_retries=self.max_retries,
+                backoff=self.retry_backoff,
+                retry_on=RETRY_ON,
+                timeout=timeout,
+            )
+
+        return self._singleflight.do(
+            (self.model.value, prompt), complete, timeout=timeout
+        )
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        """Stream generated text from a prompt using the OpenAI API.  Creating the
+        stream is retried like 'generate', within 'timeout' seconds (which defaults
+        to the 'timeout' passed to the constructor).  Errors after the response has
+        started are raised to the caller, since some text may already be yielded.
+        """
+        if timeout is None:
+            timeout = self.timeout
+
+        openai_stream = retry(
+            lambda remaining: self._client(remaining).chat.completions.create(
+                model=self.model.value,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True,
+            ),
+            max_retries=self.max_retries,
+            backoff=self.retry_backoff,
+            retry_on=RETRY_ON,
+            timeout=timeout,
+        )
+        for chunk in openai_stream:
+            text = chunk.choices[0].delta.content
+            if text:
+                yield text
@@ -0,0 +1,140 @@
+"""Transport utilities shared by HTTP-based LLM backends: connection pooling,
+retries with jittered backoff, and in-flight request coalescing ("singleflight").
+"""
+
+import random
+import threading
+import time
+from typing import Callable, Dict, Generic, Hashable, Optional, Tuple, Type, TypeVar
+
+import httpx
+
+T = TypeVar("T")
+
+
+def create_http_client(
+    max_connections: int,
+    max_keepalive_connections: int,
+    keepalive_expiry: float,
+) -> httpx.Client:
+    """Create an HTTP client with an explicitly sized connection pool.  Idle
+    connections are kept alive for 'keepalive_expiry' seconds, so that concurrent
+    and back-to-back requests don't pay for a new TCP/TLS handshake each time.
+    """
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+    )
+
+
+def retry(
+    fn: Callable[[Optional[float]], T],
+    max_retries: int,
+    backoff: float,
+    retry_on: Tuple[Type[Exception], ...],
+    timeout: Optional[float] = None,
+    max_backoff: float = 30.0,
+) -> T:
+    """Call 'fn', retrying on the given exception types with exponential backoff
+    and "full jitter" -- i.e. before retry 'n', sleep for a random time between 0
+    and 'backoff * 2**n' seconds.  Jitter keeps clients that failed together from
+    retrying together.
+
+    Args:
+        fn: The function to call.  It receives the time remaining (in seconds)
+            before 'timeout' expires, or None if there is no timeout.
+        max_retries: Maximum number of retries, after the first attempt.
+        backoff: Base backoff time, in seconds.
+        retry_on: Exception types that should trigger a retry.
+        timeout: Total time budget (in seconds) across all attempts.  No retry is
+            attempted if its backoff would exceed the remaining budget.
+        max_backoff: Upper bound on the backoff time for a single retry.
+
+    Returns:
+        The return value of 'fn'.
+    Raises:
+        The last exception raised by 'fn', if all attempts fail.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    attempt = 0
+    while True:
+        remaining = None if deadline is None else deadline - time.monotonic()
+        try:
+            return fn(remaining)
+        except retry_on:
+            delay = random.uniform(0, min(max_backoff, backoff * 2**attempt))
+            out_of_time = deadline is not None and (
+                time.monotonic() + delay >= deadline
+            )
+            if attempt >= max_retries or out_of_time:
+                raise
+            time.sleep(delay)
+            attempt += 1
+
+
+class _Call(Generic[T]):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[T] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight(Generic[T]):
+    """Coalesces concurrent calls with the same key into a single call.  The first
+    caller for a key runs the function, and any callers that arrive while it is
+    still running wait for -- and share -- its result (or exception).  Once the call
+    finishes, the next caller for that key triggers a new call.
+
+    Each waiting caller gives up after its own 'timeout', even if the call it joined
+    has a longer one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call[T]] = {}
+
+    def do(
+        self, key: Hashable, fn: Callable[[], T], timeout: Optional[float] = None
+    ) -> T:
+        """Run 'fn', or wait for the in-flight call with the same 'key'.
+
+        Args:
+            key: Calls with equal keys are coalesced.
+            fn: The function to call, if no call with 'key' is in flight.
+            timeout: Maximum time (in seconds) to wait for an in-flight call.  It
+                does not apply to 'fn' itself, which should enforce its own timeout.
+
+        Raises:
+            TimeoutError: If the in-flight call doesn't finish within 'timeout'.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+
+        if is_leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        elif not call.done.wait(timeout):
+            raise TimeoutError(
+                f"Timed out after {timeout}s waiting for in-flight call."
+            )
+
+        if call.error is not None:
+            raise call.error
+        return call.result  # type: ignore
+
+    def in_flight(self) -> int:
+        """Number of calls that are currently running."""
+        with self._lock:
+            return len(self._calls)
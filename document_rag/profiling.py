@@ -0,0 +1,304 @@
+"""Opt-in profiling for PDF ingestion.
+
+For each file, 'IngestProfiler' records:
+    - pages per second, and the number of chunks emitted
+    - time and peak memory for each stage ('extract', 'chunk', and then 'index' or
+      'embed').  Memory is measured in two ways: the peak growth of Python
+      allocations (tracemalloc), and the peak resident set size (RSS) of the
+      process, sampled in a background thread.  RSS also covers native memory
+      (e.g. ONNX Runtime), which tracemalloc cannot see.
+    - the slowest pages, and "expensive" pages that should probably be routed to a
+      different extractor: scanned pages (almost no text, but some images),
+      image-heavy pages, and pages that are much slower than the file's median.
+
+Optionally, each file is also run under 'cProfile', and the stats are written to
+'<profile_dir>/<file name>.<path hash>.prof' (view with 'python -m pstats' or
+snakeviz).  The hash of the full path keeps files with the same name apart, and the
+path of the stats is recorded in the file's profile as 'cprofile_path'.
+
+Profiling adds overhead (tracemalloc in particular slows down allocation-heavy
+code), so it is disabled unless a profiler is passed to 'add_pdf_documents'.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import hashlib
+import json
+import os
+import statistics
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Dict, Iterator, List, Optional, TypedDict
+
+
+class PageProfile(TypedDict):
+    # Zero-based page index within the PDF.
+    page: int
+    seconds: float
+    chars: int
+    images: int
+    # Why the page is considered expensive: 'scanned', 'image_heavy' or 'slow'.
+    # Empty for ordinary pages.
+    reasons: List[str]
+
+
+class StageProfile(TypedDict):
+    seconds: float
+    # Peak growth of Python allocations during the stage, in bytes.
+    traced_peak_bytes: int
+    # Peak RSS of the process during the stage, in bytes.  None if RSS sampling is
+    # not supported on this platform.
+    rss_peak_bytes: Optional[int]
+
+
+class FileProfile(TypedDict):
+    path: str
+    pages: int
+    chunks: int
+    seconds: float
+    pages_per_second: float
+    stages: Dict[str, StageProfile]
+    slowest_pages: List[PageProfile]
+    expensive_pages: List[PageProfile]
+    # Where the cProfile stats for the file were written, if at all.
+    cprofile_path: Optional[str]
+
+
+def _current_rss() -> Optional[int]:
+    """Current RSS of this process in bytes, or None if it can't be measured."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _cprofile_path(profile_dir: str, path: str) -> str:
+    """Path of the cProfile stats for the file 'path'.  Unique for each full path,
+    so that files with the same name (in different directories) don't collide.
+    """
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(profile_dir, f"{os.path.basename(path)}.{digest}.prof")
+
+
+class _RSSSampler:
+    """Samples the process RSS in a background thread, and keeps the peak value
+    since the last call to 'reset'.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = _current_rss()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            rss = _current_rss()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def start(self) -> None:
+        if self.peak is None:
+            # RSS is not available, so there is nothing to sample.
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def reset(self) -> None:
+        self.peak = _current_rss()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class IngestProfiler:
+    """Collects a 'FileProfile' for each ingested PDF.  See the module docstring.
+
+    Args:
+        slowest_pages: Number of slowest pages to keep for each file.
+        profile_dir: If given, run each file under cProfile, and write the stats
+            to this directory.
+        scanned_max_chars: Pages with at most this many characters of text, and
+            at least one image, are flagged as 'scanned'.
+        image_heavy_min_images: Pages with at least this many images are flagged
+            as 'image_heavy'.
+        slow_factor: Pages that take longer than this multiple of the file's
+            median page time (and at least 'slow_min_seconds') are flagged as 'slow'.
+        slow_min_seconds: Minimum time for a page to be flagged as 'slow'.
+    """
+
+    def __init__(
+        self,
+        slowest_pages: int = 5,
+        profile_dir: Optional[str] = None,
+        scanned_max_chars: int = 100,
+        image_heavy_min_images: int = 8,
+        slow_factor: float = 10.0,
+        slow_min_seconds: float = 0.1,
+    ):
+        self.slowest_pages = slowest_pages
+        self.profile_dir = profile_dir
+        self.scanned_max_chars = scanned_max_chars
+        self.image_heavy_min_images = image_heavy_min_images
+        self.slow_factor = slow_factor
+        self.slow_min_seconds = slow_min_seconds
+        self.profiles: List[FileProfile] = []
+
+        self._current: Optional[FileProfile] = None
+        self._pages: List[PageProfile] = []
+        self._sampler: Optional[_RSSSampler] = None
+
+    @contextmanager
+    def profile_file(self, path: str) -> Iterator[FileProfile]:
+        """Profile everything within the context as ingestion of the file 'path'."""
+        profile = FileProfile(
+            path=path,
+            pages=0,
+            chunks=0,
+            seconds=0.0,
+            pages_per_second=0.0,
+            stages={},
+            slowest_pages=[],
+            expensive_pages=[],
+            cprofile_path=None,
+        )
+        self._current = profile
+        self._pages = []
+        self._sampler = _RSSSampler()
+        self._sampler.start()
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        profiler = cProfile.Profile() if self.profile_dir is not None else None
+        if profiler is not None:
+            profiler.enable()
+
+        start = time.perf_counter()
+        try:
+            yield profile
+        finally:
+            profile["seconds"] = time.perf_counter() - start
+            if profiler is not None and self.profile_dir is not None:
+                profiler.disable()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                cprofile_path = _cprofile_path(self.profile_dir, path)
+                profiler.dump_stats(cprofile_path)
+                profile["cprofile_path"] = cprofile_path
+            if started_tracing:
+                tracemalloc.stop()
+            self._sampler.stop()
+            self._finish_file(profile)
+            self.profiles.append(profile)
+            self._current = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Record time and peak memory for one stage of the current file."""
+        if self._current is None or self._sampler is None:
+            raise RuntimeError("'stage' must be used within 'profile_file'.")
+
+        self._sampler.reset()
+        traced_start, _ = tracemalloc.get_traced_memory()
+        if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            _, traced_peak = tracemalloc.get_traced_memory()
+            rss_peak = self._sampler.peak
+            rss_now = _current_rss()
+            if rss_peak is not None and rss_now is not None:
+                # Catch short stages, which finish between two samples.
+                rss_peak = max(rss_peak, rss_now)
+            self._current["stages"][name] = StageProfile(
+                seconds=time.perf_counter() - start,
+                traced_peak_bytes=max(traced_peak - traced_start, 0),
+                rss_peak_bytes=rss_peak,
+            )
+
+    def record_page(self, page: int, seconds: float, text: str, images: int) -> None:
+        """Record the text extraction of a single page in the current file."""
+        self._pages.append(
+            PageProfile(
+                page=page, seconds=seconds, chars=len(text), images=images, reasons=[]
+            )
+        )
+
+    def record_chunks(self, chunks: int) -> None:
+        """Record the number of chunks emitted for the current file."""
+        if self._current is not None:
+            self._current["chunks"] += chunks
+
+    def _finish_file(self, profile: FileProfile) -> None:
+        pages = self._pages
+        profile["pages"] = len(pages)
+        extract = profile["stages"].get("extract")
+        extract_seconds = profile["seconds"] if extract is None else extract["seconds"]
+        if extract_seconds > 0:
+            profile["pages_per_second"] = len(pages) / extract_seconds
+
+        slow_seconds = float("inf")
+        if pages:
+            median = statistics.median(page["seconds"] for page in pages)
+            slow_seconds = max(self.slow_factor * median, self.slow_min_seconds)
+        for page in pages:
+            if page["chars"] <= self.scanned_max_chars and page["images"] > 0:
+                page["reasons"].append("scanned")
+            if page["images"] >= self.image_heavy_min_images:
+                page["reasons"].append("image_heavy")
+            if page["seconds"] >= slow_seconds:
+                page["reasons"].append("slow")
+
+        profile["slowest_pages"] = sorted(pages, key=lambda p: -p["seconds"])[
+            : self.slowest_pages
+        ]
+        profile["expensive_pages"] = [page for page in pages if page["reasons"]]
+
+    def format_report(self) -> str:
+        """Format the collected profiles as a human-readable report."""
+        lines: List[str] = []
+        for profile in self.profiles:
+            lines.append(
+                f"{profile['path']}: {profile['pages']} pages, {profile['chunks']} "
+                f"chunks, {profile['seconds']:.2f}s "
+                f"({profile['pages_per_second']:.1f} pages/s)"
+            )
+            for name, stage in profile["stages"].items():
+                rss = stage["rss_peak_bytes"]
+                rss_str = "n/a" if rss is None else f"{rss / 2**20:.1f} MB"
+                lines.append(
+                    f"  {name:<8} {stage['seconds']:8.2f}s  "
+                    f"python peak +{stage['traced_peak_bytes'] / 2**20:.1f} MB  "
+                    f"rss peak {rss_str}"
+                )
+            if profile["slowest_pages"]:
+                slowest = ", ".join(
+                    f"{p['page']} ({p['seconds']:.3f}s)"
+                    for p in profile["slowest_pages"]
+                )
+                lines.append(f"  slowest pages: {slowest}")
+            for page in profile["expensive_pages"]:
+                lines.append(
+                    f"  expensive page {page['page']}: {', '.join(page['reasons'])} "
+                    f"({page['chars']} chars, {page['images']} images, "
+                    f"{page['seconds']:.3f}s)"
+                )
+        return "\n".join(lines)
+
+    def save(self, path: str) -> None:
+        """Save the collected profiles as JSON."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.profiles, f, indent=2)
+
+
+def profile_stage(profiler: Optional[IngestProfiler], name: str) -> ContextManager:
+    """'profiler.stage(name)', or a no-op context if 'profiler' is None."""
+    return nullcontext() if profiler is None else profiler.stage(name)
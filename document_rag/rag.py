@@ -1,12 +1,18 @@
-from typing import List, Optional, Sequence, TypedDict
+import time
+from enum import Enum
+from typing import Iterator, List, Optional, Sequence, Tuple, TypedDict
 
 import numpy as np
 from typing_extensions import Self
 
+from document_rag.embedder import load_embedder
+from document_rag.embedder.precomputed import load_embeddings
 from document_rag.llm import BaseLLM, load_llm
+from document_rag.profiling import IngestProfiler
 from document_rag.ranker import BaseRanker, load_ranker
 from document_rag.settings import Settings
 from document_rag.vector_db import BaseVectorDB, SearchResult, create_vector_db
+from document_rag.vector_db.results import top_k_indices
 
 SETTINGS = Settings()
 DOCUMENT_TEMPLATE = """
@@ -27,10 +33,31 @@ Base your answer ONLY on the documents above.  Answer as concisely as possible,
 still being complete.  If you cannot answer, respond with the word UNKNOWN."""
 
 
+class Degradation(str, Enum):
+    """Shortcuts that 'RAG.generate' may take in order to meet a deadline."""
+
+    # Fewer chunks were retrieved from the vector DB than 'retriever_chunks'.
+    REDUCED_RETRIEVER_CHUNKS = "reduced_retriever_chunks"
+    # Only the top (dense) retriever results were passed to the ranker.
+    REDUCED_RANKER_CHUNKS = "reduced_ranker_chunks"
+    # The ranker was skipped entirely, and dense similarity scores were used.
+    SKIPPED_RANKER = "skipped_ranker"
+    # LLM generation was limited to the time remaining before the deadline.
+    CAPPED_LLM_TIME = "capped_llm_time"
+
+
 class RAGResult(TypedDict):
     text: str
     prompt: str
     search_results: Sequence[SearchResult]
+    degradations: List[Degradation]
+
+
+class RAGStream(TypedDict):
+    text: Iterator[str]
+    prompt: str
+    search_results: Sequence[SearchResult]
+    degradations: List[Degradation]
 
 
 class RAG:
@@ -46,12 +73,18 @@ class RAG:
         # TODO: Add description for these parameters
         retriever_chunks: int = SETTINGS.DOCUMENT_RAG_RETRIEVER_CHUNKS,
         ranker_chunks: int = SETTINGS.DOCUMENT_RAG_RANKER_CHUNKS,
+        llm_budget_fraction: float = SETTINGS.DOCUMENT_RAG_LLM_BUDGET_FRACTION,
     ):
         self.llm = llm
         self.ranker = ranker
         self.vector_db = vector_db
         self.retriever_chunks = retriever_chunks
         self.ranker_chunks = ranker_chunks
+        self.llm_budget_fraction = llm_budget_fraction
+        # Running estimate of the ranker cost per chunk (in seconds), which is
+        # updated after every call to 'ranker.predict'.  Used to decide how much
+        # ranking we can afford when 'generate' is called with a timeout.
+        self.ranker_seconds_per_chunk: Optional[float] = None
 
     @classmethod
     def from_settings(
@@ -78,50 +111,168 @@ class RAG:
         llm = load_llm(
             type=settings.DOCUMENT_RAG_LLM_TYPE,
             model=settings.DOCUMENT_RAG_LLM_MODEL,
+            settings=settings,
         )
         ranker = load_ranker(
             type=settings.DOCUMENT_RAG_RANKER_TYPE,
             model=settings.DOCUMENT_RAG_RANKER_MODEL,
         )
+        embedder = load_embedder(
+            type=settings.DOCUMENT_RAG_EMBEDDER_TYPE,
+            model=settings.DOCUMENT_RAG_EMBEDDER_MODEL,
+            batch_size=settings.DOCUMENT_RAG_EMBEDDER_BATCH_SIZE,
+            workers=settings.DOCUMENT_RAG_EMBEDDER_WORKERS,
+        )
         vector_db = create_vector_db(
             type=settings.DOCUMENT_RAG_VECTOR_DB_TYPE,
             cache_dir=settings.DOCUMENT_RAG_VECTOR_DB_CACHE_DIR,
             exist_ok=vector_db_exists_ok,
+            embedder=embedder,
         )
 
-        return cls(llm=llm, ranker=ranker, vector_db=vector_db)
+        return cls(
+            llm=llm,
+            ranker=ranker,
+            vector_db=vector_db,
+            retriever_chunks=settings.DOCUMENT_RAG_RETRIEVER_CHUNKS,
+            ranker_chunks=settings.DOCUMENT_RAG_RANKER_CHUNKS,
+            llm_budget_fraction=settings.DOCUMENT_RAG_LLM_BUDGET_FRACTION,
+        )
 
-    def add_pdf_documents(self, paths: Sequence[str], verbose: bool = False) -> None:
+    def add_pdf_documents(
+        self,
+        paths: Sequence[str],
+        verbose: bool = False,
+        profiler: Optional[IngestProfiler] = None,
+    ) -> None:
         """Add one or more PDF documents to the DB, keeping track of text metadata.
 
         Args:
             paths: The local paths to the PDF documents to add.
             verbose: Whether to display a progress bar during the PDF extraction step.
+            profiler: If given, profile the ingestion of each document.  Results are
+                collected in 'profiler.profiles'.
         """
-        self.vector_db.add_pdf_documents(paths, verbose=verbose)
+        self.vector_db.add_pdf_documents(paths, verbose=verbose, profiler=profiler)
 
-    # TODO: Move number of documents to a configurable setting
-    def generate(self, prompt: str) -> RAGResult:
-        """Run retrieval-augmented generation on a prompt, using the given documents.
+    def import_embeddings(self, path: str) -> None:
+        """Add documents to the DB from precomputed embeddings, which were saved by
+        'document_rag.embedder.precomputed.save_embeddings' (e.g. on a batch node).
 
         Args:
-            prompt: The question or prompt from a user, which will be used as the
-                input to the LLM.
+            path: The local path to the saved embeddings.
+        Raises:
+            ValueError: If the embeddings were computed with a different model, or
+                the documents split with different chunk settings, than the vector
+                DB uses.
+        """
+        precomputed = load_embeddings(path)
+        self.vector_db.add_embeddings(
+            precomputed["documents"],
+            precomputed["embeddings"],
+            model=precomputed["model"],
+            chunk_size=precomputed["chunk_size"],
+            chunk_overlap=precomputed["chunk_overlap"],
+        )
+
+    def export_snapshot(self, path: str) -> None:
+        """Export the vector DB to a single snapshot file, which can be copied to
+        other machines and loaded with 'import_snapshot'.
+
+        Args:
+            path: The local path to write the snapshot to.
+        """
+        self.vector_db.export_snapshot(path)
+
+    def import_snapshot(self, path: str) -> None:
+        """Add all documents from a snapshot file (see 'export_snapshot') to the DB.
+        This is much faster than 'add_pdf_documents', since nothing is re-embedded.
+
+        Args:
+            path: The local path to the snapshot.
+        Raises:
+            ValueError: If the snapshot was built with a different embedding model or
+                chunk settings than the vector DB uses.
+        """
+        self.vector_db.import_snapshot(path)
+
+    def _affordable_ranker_chunks(self, deadline: float) -> int:
+        """Estimate how many chunks the ranker can score before its share of the
+        time remaining until 'deadline' runs out.
+        """
+        if self.ranker_seconds_per_chunk is None:
+            # No measurements yet -- optimistically assume we can rank everything.
+            return self.retriever_chunks
+
+        remaining = deadline - time.monotonic()
+        ranker_budget = remaining * (1 - self.llm_budget_fraction)
+        if ranker_budget <= 0:
+            return 0
+        return int(ranker_budget / max(self.ranker_seconds_per_chunk, 1e-9))
+
+    def _rank(self, prompt: str, texts: Sequence[str]) -> np.ndarray:
+        """Score the given texts with the ranker, and update the running estimate
+        of ranker cost per chunk.
+        """
+        start = time.monotonic()
+        scores = self.ranker.predict(documents=texts, query=prompt)
+        if len(texts) > 0:
+            seconds_per_chunk = (time.monotonic() - start) / len(texts)
+            if self.ranker_seconds_per_chunk is None:
+                self.ranker_seconds_per_chunk = seconds_per_chunk
+            else:
+                self.ranker_seconds_per_chunk = (
+                    0.8 * self.ranker_seconds_per_chunk + 0.2 * seconds_per_chunk
+                )
+
+        return np.asarray(scores, dtype=np.float64)
+
+    def _prepare(
+        self, prompt: str, timeout: Optional[float] = None
+    ) -> Tuple[str, List[SearchResult], List[Degradation], Optional[float]]:
+        """Retrieve and rank the documents for a prompt, and build the LLM prompt.
 
         Returns:
-            The generated response from the LLM.
+            A tuple of (LLM prompt, ranked search results, applied degradations,
+            time remaining for the LLM in seconds -- or None if there's no deadline).
         """
-        retriever_results = self.vector_db.search(prompt, limit=self.retriever_chunks)
-        ranker_scores = self.ranker.predict(
-            documents=[result["text"] for result in retriever_results],
-            query=prompt,
-        )
-        sorted_indices = np.argsort(ranker_scores).tolist()
-        topk_indices = sorted_indices[-self.ranker_chunks :]
-        ranker_results: List[SearchResult] = [
-            {**retriever_results[i], "similarity": ranker_scores[i]}  # type: ignore
-            for i in topk_indices
-        ]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        degradations: List[Degradation] = []
+
+        retriever_limit = self.retriever_chunks
+        if deadline is not None:
+            affordable = self._affordable_ranker_chunks(deadline)
+            if affordable < retriever_limit:
+                retriever_limit = max(affordable, self.ranker_chunks)
+                degradations.append(Degradation.REDUCED_RETRIEVER_CHUNKS)
+        # Text is only loaded for the chunks that reach the ranker or the prompt.
+        retriever_results = self.vector_db.search_results(prompt, limit=retriever_limit)
+
+        # Retrieval also takes time, so check again before ranking.
+        num_candidates = len(retriever_results)
+        if deadline is not None:
+            affordable = self._affordable_ranker_chunks(deadline)
+            if affordable < min(num_candidates, self.ranker_chunks):
+                num_candidates = 0
+                degradations.append(Degradation.SKIPPED_RANKER)
+            elif affordable < num_candidates:
+                num_candidates = affordable
+                degradations.append(Degradation.REDUCED_RANKER_CHUNKS)
+
+        if num_candidates > 0:
+            # Retriever results are sorted by decreasing similarity, so truncating
+            # keeps the most promising candidates.
+            candidates = retriever_results.take(np.arange(num_candidates))
+            ranker_scores = self._rank(prompt, candidates.texts())
+            indices = top_k_indices(ranker_scores, self.ranker_chunks)
+            topk = candidates.take(indices, scores=ranker_scores[indices])
+        else:
+            # Fall back to dense similarity scores.
+            topk = retriever_results.take(
+                np.arange(min(self.ranker_chunks, len(retriever_results)))
+            )
+        # Documents are listed in the prompt in order of increasing score.
+        ranker_results = topk.take(np.arange(len(topk))[::-1]).to_list()
 
         document_strings = [
             DOCUMENT_TEMPLATE.format(
@@ -131,10 +282,59 @@ class RAG:
         ]
         documents = "\n".join(document_strings)
         llm_prompt = PROMPT_TEMPLATE.format(documents=documents, question=prompt)
-        llm_response = self.llm.generate(llm_prompt)
+
+        llm_timeout: Optional[float] = None
+        if deadline is not None:
+            llm_timeout = deadline - time.monotonic()
+            if llm_timeout <= 0:
+                raise TimeoutError("Deadline passed before LLM generation started.")
+            degradations.append(Degradation.CAPPED_LLM_TIME)
+
+        return llm_prompt, ranker_results, degradations, llm_timeout
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> RAGResult:
+        """Run retrieval-augmented generation on a prompt, using the given documents.
+
+        If 'timeout' is given, the pipeline degrades gracefully to finish in time:
+        fewer chunks are retrieved and ranked as the budget runs out, dense retriever
+        scores replace the ranker if ranking would miss the deadline, and the LLM is
+        only given the time that remains.  Applied degradations are listed in the
+        'degradations' field of the result.
+
+        Args:
+            prompt: The question or prompt from a user, which will be used as the
+                input to the LLM.
+            timeout: Maximum time (in seconds) for the full call.  If None, no
+                deadline is enforced.
+
+        Returns:
+            The generated response from the LLM.
+        Raises:
+            TimeoutError: If the deadline passes before LLM generation can start.
+        """
+        llm_prompt, ranker_results, degradations, llm_timeout = self._prepare(
+            prompt, timeout=timeout
+        )
+        llm_response = self.llm.generate(llm_prompt, timeout=llm_timeout)
 
         return RAGResult(
             text=llm_response,
             prompt=llm_prompt,
             search_results=ranker_results,
+            degradations=degradations,
+        )
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> RAGStream:
+        """Same as 'generate', but the LLM response is streamed back as an iterator
+        of text chunks.  Retrieval and ranking happen eagerly, so the search results
+        are available before the first chunk of text.
+        """
+        llm_prompt, ranker_results, degradations, llm_timeout = self._prepare(
+            prompt, timeout=timeout
+        )
+        return RAGStream(
+            text=self.llm.stream(llm_prompt, timeout=llm_timeout),
+            prompt=llm_prompt,
+            search_results=ranker_results,
+            degradations=degradations,
         )
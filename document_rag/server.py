@@ -0,0 +1,434 @@
+"""Concurrent HTTP server for a single, shared RAG instance.
+
+Endpoints (all request/response bodies are JSON):
+    GET  /health        -> {"status": "ok"}
+    POST /ingest        {"paths": [...]} -> {"paths": [...]}
+    POST /query         {"prompt": "...", "timeout": 10.0} -> RAGResult
+    POST /query/stream  {"prompt": "...", "timeout": 10.0} -> newline-delimited
+        JSON.  The first line contains the 'prompt', 'search_results' and
+        'degradations' fields, and each following line is {"text": "..."}.  If
+        generation fails part-way, the last line is {"error": "..."}.
+
+Invalid requests get a 400 response, queries that run out of time a 504, and any
+other error a 500 -- always with an {"error": "..."} body.
+
+Requests are handled by a fixed pool of threads, which all share one RAG object
+(and therefore one copy of the LLM / ranker / vector DB).  Accepted connections
+wait in a bounded queue.  When the queue is full, new connections are rejected
+immediately with '503 Service Unavailable', rather than piling up unbounded.
+
+For more throughput, 'serve' can fork several worker processes after the RAG
+object is loaded.  Each worker gets a copy-on-write view of the parent's memory,
+so model weights are shared between workers instead of being loaded N times.
+Because each worker has its own (private) copy of the vector DB, ingestion is
+disabled in multi-process mode -- ingest documents before calling 'serve'.
+"""
+
+from __future__ import annotations
+
+import gc
+import json
+import os
+import queue
+import signal
+import socket
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from openai import APITimeoutError
+
+from document_rag.rag import RAG, RAGResult
+
+
+class _ReadWriteLock:
+    """Allows any number of concurrent readers, or a single writer.  Queries only
+    read from the vector DB, so they can run concurrently.  Ingestion writes to it,
+    so it must run alone.
+
+    Writers take priority: while a writer is waiting, new readers wait too, so that
+    steady query traffic can't keep ingestion waiting forever.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    def acquire_read(self) -> None:
+        with self._condition:
+            while self._writing or self._waiting_writers > 0:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self) -> None:
+        with self._condition:
+            self._readers -= 1
+            if self._readers == 0:
+                self._condition.notify_all()
+
+    def acquire_write(self) -> None:
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                while self._writing or self._readers > 0:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writing = True
+
+    def release_write(self) -> None:
+        with self._condition:
+            self._writing = False
+            self._condition.notify_all()
+
+
+class RAGRequestHandler(BaseHTTPRequestHandler):
+    server: RAGServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def log_error(self, format: str, *args: Any) -> None:
+        # Errors are always logged, even if 'verbose' is False.
+        super().log_message(format, *args)
+
+    def _send_json(self, status: HTTPStatus, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object.")
+        return body
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._send_json(HTTPStatus.OK, {"status": "ok"})
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "Not found."})
+
+    def do_POST(self) -> None:
+        routes = {
+            "/ingest": self._ingest,
+            "/query": self._query,
+            "/query/stream": self._query_stream,
+        }
+        if self.path not in routes:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": "Not found."})
+            return
+
+        try:
+            routes[self.path](self._read_json())
+        except (ValueError, KeyError, FileNotFoundError) as e:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        except (TimeoutError, APITimeoutError) as e:
+            # 'APITimeoutError' is raised when the LLM call runs out of time, which
+            # is expected when a query has a deadline.
+            self._send_json(HTTPStatus.GATEWAY_TIMEOUT, {"error": str(e)})
+        except Exception as e:
+            # Always respond, rather than closing the connection without a word.
+            self.log_error("Error handling %s: %r", self.path, e)
+            self._send_json(
+                HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error."}
+            )
+
+    def _query_args(self, body: Dict[str, Any]) -> Tuple[str, Optional[float]]:
+        prompt = body["prompt"]
+        timeout = body.get("timeout")
+        if not isinstance(prompt, str):
+            raise ValueError("'prompt' must be a string.")
+        if timeout is not None and (
+            isinstance(timeout, bool) or not isinstance(timeout, (int, float))
+        ):
+            raise ValueError("'timeout' must be a number of seconds, or null.")
+        return prompt, timeout
+
+    def _ingest(self, body: Dict[str, Any]) -> None:
+        if not self.server.allow_ingest:
+            self._send_json(
+                HTTPStatus.FORBIDDEN,
+                {"error": "Ingestion is disabled when serving with multiple workers."},
+            )
+            return
+
+        paths: List[str] = body["paths"]
+        self.server.lock.acquire_write()
+        try:
+            self.server.rag.add_pdf_documents(paths)
+        finally:
+            self.server.lock.release_write()
+        self._send_json(HTTPStatus.OK, {"paths": paths})
+
+    def _query(self, body: Dict[str, Any]) -> None:
+        prompt, timeout = self._query_args(body)
+        rag = self.server.rag
+        # Only retrieval and ranking read the vector DB.  Release the lock before
+        # the (slow) LLM call, so that it doesn't hold up ingestion.
+        self.server.lock.acquire_read()
+        try:
+            llm_prompt, search_results, degradations, llm_timeout = rag._prepare(
+                prompt, timeout=timeout
+            )
+        finally:
+            self.server.lock.release_read()
+
+        result = RAGResult(
+            text=rag.llm.generate(llm_prompt, timeout=llm_timeout),
+            prompt=llm_prompt,
+            search_results=search_results,
+            degradations=degradations,
+        )
+        self._send_json(HTTPStatus.OK, dict(result))
+
+    def _query_stream(self, body: Dict[str, Any]) -> None:
+        prompt, timeout = self._query_args(body)
+        self.server.lock.acquire_read()
+        try:
+            result = self.server.rag.stream(prompt=prompt, timeout=timeout)
+        finally:
+            self.server.lock.release_read()
+
+        # HTTP/1.0 without a 'Content-Length' header -- the end of the stream is
+        # signalled by closing the connection.
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        header = {k: v for k, v in result.items() if k != "text"}
+        self.wfile.write(json.dumps(header).encode("utf-8") + b"\n")
+        try:
+            for text in result["text"]:
+                self.wfile.write(json.dumps({"text": text}).encode("utf-8") + b"\n")
+                self.wfile.flush()
+        except Exception as e:
+            # The status line has already been sent, so report the error in-band.
+            self.log_error("Error streaming %s: %r", self.path, e)
+            timed_out = isinstance(e, (TimeoutError, APITimeoutError))
+            error = str(e) if timed_out else "Internal server error."
+            self.wfile.write(json.dumps({"error": error}).encode("utf-8") + b"\n")
+
+
+class _RejectRequestHandler(BaseHTTPRequestHandler):
+    """Reads a request in full, and rejects it with '503 Service Unavailable'.
+    (Closing the socket before reading the request body would reset the connection,
+    and the client would see a broken pipe instead of a proper response.)
+    """
+
+    server: RAGServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _reject(self) -> None:
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(HTTPStatus.SERVICE_UNAVAILABLE)
+        self.send_header("Retry-After", "1")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_GET = _reject
+    do_POST = _reject
+
+
+class RAGServer(HTTPServer):
+    """HTTP server that handles requests with a fixed-size thread pool, fed by a
+    bounded queue of accepted connections.
+
+    Args:
+        server_address: The (host, port) to bind to.
+        rag: The RAG object shared by all request threads.
+        threads: Number of request-handling threads.
+        queue_size: Maximum number of accepted connections waiting for a thread.
+            Connections beyond this limit are rejected with a 503 response.
+        allow_ingest: Whether to enable the '/ingest' endpoint.
+        verbose: Whether to log every request to stderr.
+    """
+
+    # Listen backlog for the server socket.  Keep it large, so that overload is
+    # handled by the (bounded) request queue, and not by the kernel dropping or
+    # resetting connections.
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        server_address: Tuple[str, int],
+        rag: RAG,
+        threads: int = 4,
+        queue_size: int = 16,
+        allow_ingest: bool = True,
+        verbose: bool = False,
+    ):
+        if threads < 1 or queue_size < 1:
+            raise ValueError("Both 'threads' and 'queue_size' must be at least 1.")
+
+        super().__init__(server_address, RAGRequestHandler)
+        self.rag = rag
+        self.threads = threads
+        self.allow_ingest = allow_ingest
+        self.verbose = verbose
+        self.lock = _ReadWriteLock()
+        # Maximum time to spend reading a request that will be rejected, and the
+        # maximum number of requests being rejected at once.  Beyond that limit,
+        # connections are closed without a response.
+        self.reject_timeout = 1.0
+        self._rejectors = threading.BoundedSemaphore(4)
+        self._queue: queue.Queue[Optional[Tuple[socket.socket, Any]]] = queue.Queue(
+            maxsize=queue_size
+        )
+        self._workers: List[threading.Thread] = []
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def _start_workers(self) -> None:
+        # Threads don't survive 'os.fork', so workers are started lazily from
+        # 'serve_forever', which runs in the process that actually serves requests.
+        if self._workers:
+            return
+        for _ in range(self.threads):
+            worker = threading.Thread(target=self._work, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def process_request(self, request, client_address) -> None:  # type: ignore
+        try:
+            self._queue.put_nowait((request, client_address))
+        except queue.Full:
+            # Rejecting is cheap, but still requires reading the request.  Do that
+            # in a short-lived thread, so that the accept loop never blocks.  The
+            # number of those threads is bounded, so that a flood of requests
+            # can't create an unbounded number of threads.
+            if not self._rejectors.acquire(blocking=False):
+                self.shutdown_request(request)
+                return
+            threading.Thread(
+                target=self._reject, args=(request, client_address), daemon=True
+            ).start()
+
+    def _reject(self, request: socket.socket, client_address: Any) -> None:
+        request.settimeout(self.reject_timeout)
+        try:
+            _RejectRequestHandler(request, client_address, self)
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+            self._rejectors.release()
+
+    def serve_forever(self, poll_interval: float = 0.5) -> None:
+        self._start_workers()
+        super().serve_forever(poll_interval=poll_interval)
+
+    def server_close(self) -> None:
+        super().server_close()
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+
+def serve(
+    rag: RAG,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    workers: int = 1,
+    threads: int = 4,
+    queue_size: int = 16,
+    verbose: bool = False,
+) -> None:
+    """Serve a RAG object over HTTP until interrupted.
+
+    Args:
+        rag: The (fully loaded) RAG object to serve.
+        host: The host address to bind to.
+        port: The port to bind to.
+        workers: Number of worker processes.  If greater than 1, workers are forked
+            from this process, and share its memory (including model weights)
+            through copy-on-write.  Ingestion is disabled in that case.
+        threads: Number of request-handling threads per worker.
+        queue_size: Maximum number of queued connections per worker.
+        verbose: Whether to log every request to stderr.
+    """
+    server = RAGServer(
+        (host, port),
+        rag=rag,
+        threads=threads,
+        queue_size=queue_size,
+        allow_ingest=(workers == 1),
+        verbose=verbose,
+    )
+    if workers == 1:
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+        return
+
+    # Move everything allocated so far into a permanent GC generation.  Otherwise,
+    # the garbage collector in each worker touches (and therefore copies) every
+    # page that holds a Python object.
+    gc.freeze()
+    pids: List[int] = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            signal.signal(signal.SIGTERM, lambda *_: os._exit(0))
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        pids.append(pid)
+
+    # Without a handler, SIGTERM (how systemd, docker, etc. stop a service) would
+    # kill this process immediately, and leave the workers running as orphans.
+    # Raising 'SystemExit' instead runs the 'finally' block below.
+    def _exit(signum: int, frame: Any) -> None:
+        raise SystemExit(128 + signum)
+
+    handlers = {
+        signum: signal.signal(signum, _exit)
+        for signum in (signal.SIGTERM, signal.SIGINT)
+    }
+    running = list(pids)
+    try:
+        while running:
+            os.waitpid(running[0], 0)
+            running.pop(0)
+    finally:
+        # Ignore further signals while shutting down the workers.
+        for signum in handlers:
+            signal.signal(signum, signal.SIG_IGN)
+        for pid in running:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in running:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+        server.server_close()
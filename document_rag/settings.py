@@ -36,6 +36,8 @@ class Settings(BaseSettings):
 
     # Tokens / API keys for third-party services
     OPENAI_API_KEY: Optional[str] = None
+    # Base URL for the OpenAI API.  Set this to use an OpenAI-compatible server.
+    OPENAI_BASE_URL: Optional[str] = None
     HUGGINGFACE_TOKEN: Optional[str] = None
 
     # General RAG settings -- applicable to all LLM / ranker / vector DB choices
@@ -56,14 +58,32 @@ class Settings(BaseSettings):
     # window.  The ranker should be able to filter down to a small number of chunks
     # while maintaining high precision.
     DOCUMENT_RAG_RANKER_CHUNKS: int = 5
+    # When 'RAG.generate' is called with a timeout, the fraction of the remaining
+    # time (after retrieval) that is reserved for LLM generation.  The ranker gets
+    # the rest, and is scaled back or skipped if it would not finish in time.
+    DOCUMENT_RAG_LLM_BUDGET_FRACTION: float = 0.5
 
     # LLM settings
     #
     # The type of LLM to use.  Currently, only 'openai' and 'huggingface' are supported.
+    # ('fake' returns a canned response, and is only intended for testing.)
     DOCUMENT_RAG_LLM_TYPE: str = "openai"
     # The name of the LLM model to use.  This is dependent on the LLM type.
     # For more details, see the 'document_rag/llm' directory.
     DOCUMENT_RAG_LLM_MODEL: str = "gpt-3.5-turbo-1106"
+    # Transport settings for API-based LLMs (currently 'openai').  The default time
+    # limit (in seconds) for each call, including retries.
+    DOCUMENT_RAG_LLM_TIMEOUT: float = 60.0
+    # Failed requests (connection errors, timeouts, rate limits, 5xx errors) are
+    # retried up to this many times, with jittered exponential backoff starting
+    # from DOCUMENT_RAG_LLM_RETRY_BACKOFF seconds.
+    DOCUMENT_RAG_LLM_MAX_RETRIES: int = 3
+    DOCUMENT_RAG_LLM_RETRY_BACKOFF: float = 0.5
+    # Connection pool size, and how many idle connections to keep alive (and for
+    # how long, in seconds) for reuse by later requests.
+    DOCUMENT_RAG_LLM_MAX_CONNECTIONS: int = 16
+    DOCUMENT_RAG_LLM_MAX_KEEPALIVE_CONNECTIONS: int = 8
+    DOCUMENT_RAG_LLM_KEEPALIVE_EXPIRY: float = 30.0
 
     # Ranker settings
     #
@@ -73,6 +93,21 @@ class Settings(BaseSettings):
     # For more details, see the 'document_rag/ranker' directory.
     DOCUMENT_RAG_RANKER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
 
+    # Embedder settings
+    #
+    # The type of embedder to use.  Currently, only 'fastembed' is supported.
+    DOCUMENT_RAG_EMBEDDER_TYPE: str = "fastembed"
+    # The name of the embedding model to use.  This is dependent on the embedder type.
+    # The vector DB records which model it was built with, and refuses to open with
+    # a different one.  For more details, see the 'document_rag/embedder' directory.
+    DOCUMENT_RAG_EMBEDDER_MODEL: str = "BAAI/bge-small-en"
+    # The number of documents to embed at once.  Larger batches are faster, but use
+    # more memory.
+    DOCUMENT_RAG_EMBEDDER_BATCH_SIZE: int = 256
+    # The number of data-parallel worker processes for embedding documents.  If not
+    # set, embed in the main process.  If 0, use one worker per CPU core.
+    DOCUMENT_RAG_EMBEDDER_WORKERS: Optional[int] = None
+
     # Vector DB settings
     #
     # The type of vector DB to use.  Currently, only 'qdrant' is supported.
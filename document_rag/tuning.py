@@ -0,0 +1,421 @@
+"""Offline harness for tuning the retrieval settings of the RAG pipeline.
+
+Sweeps over chunk size, chunk overlap, retriever chunks and ranker chunks, and
+measures retrieval quality against a labelled set of questions.  Each question is
+labelled with the pages that contain its answer, for example:
+
+```
+[
+    {"question": "What is Alice's cat's name?", "pages": [["alice.pdf", 13]]},
+    ...
+]
+```
+
+Page numbers follow the 'page_range' metadata of each chunk (i.e. the page numbers
+shown by 'chatbot.py --show-references').  A chunk is relevant to a question if its
+page range (inclusive) contains any of the labelled pages.
+
+Expensive work is cached across configurations: each PDF is parsed once, each
+unique chunk of text and each question is embedded once, and each (question, chunk)
+pair is scored by the ranker once.  The cost of every cached item (including PDF
+parsing) is recorded when it is first computed, so reported costs are what each
+configuration would cost without the cache.  Parsing doesn't depend on the
+settings, so its cost is the same for every configuration.
+
+Usage:
+    python -m document_rag.tuning labels.json --documents alice.pdf \\
+        --chunk-sizes 64 128 256 --chunk-overlaps 0 32 64
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import time
+from typing import Dict, List, Optional, Sequence, Tuple, TypedDict
+
+import numpy as np
+
+from document_rag.embedder import BaseEmbedder
+from document_rag.ranker import BaseRanker
+from document_rag.settings import Settings
+from document_rag.vector_db.base import TextMetadata, chunk_pages, read_pdf_pages
+from document_rag.vector_db.chunk_store import stored_size
+
+SETTINGS = Settings()
+
+
+class LabelledQuestion(TypedDict):
+    question: str
+    # List of (path, page number) pairs, which contain the answer to the question.
+    pages: List[Tuple[str, int]]
+
+
+class TuningResult(TypedDict):
+    chunk_size: int
+    chunk_overlap: int
+    retriever_chunks: int
+    ranker_chunks: int
+    num_chunks: int
+    # Average fraction of labelled pages covered by the retrieved chunks.
+    recall: float
+    # Average fraction of ranked chunks (passed to the LLM) that are relevant.
+    ranker_precision: float
+    # Fraction of questions with at least one relevant chunk passed to the LLM.
+    hit_rate: float
+    # Ingestion cost (for all documents), in seconds.
+    parse_seconds: float
+    chunk_seconds: float
+    embed_seconds: float
+    # Average query cost, in seconds.
+    retriever_seconds: float
+    ranker_seconds: float
+    # Size of the vectors and text stored in the index, in megabytes.  Text is
+    # counted as the chunk store keeps it -- once per document, without overlaps.
+    index_megabytes: float
+    # Whether this configuration is on the quality vs. latency/memory Pareto front.
+    pareto: bool
+
+
+def load_questions(path: str) -> List[LabelledQuestion]:
+    """Load labelled questions from a JSON file (see module docstring)."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    return [
+        LabelledQuestion(
+            question=item["question"],
+            pages=[(page_path, int(page)) for page_path, page in item["pages"]],
+        )
+        for item in data
+    ]
+
+
+def _covers(metadata: TextMetadata, path: str, page: int) -> bool:
+    start_page, end_page = metadata["page_range"]
+    return path == metadata["path"] and start_page <= page <= end_page
+
+
+def _is_relevant(metadata: TextMetadata, question: LabelledQuestion) -> bool:
+    return any(_covers(metadata, path, page) for path, page in question["pages"])
+
+
+class _CachedEmbedder:
+    """Embeds texts and queries, caching both the vectors and how long each one
+    took to compute.
+    """
+
+    def __init__(self, embedder: BaseEmbedder):
+        self.embedder = embedder
+        self.vectors: Dict[str, np.ndarray] = {}
+        self.seconds: Dict[str, float] = {}
+        self.query_vectors: Dict[str, np.ndarray] = {}
+        self.query_seconds: Dict[str, float] = {}
+
+    def embed_documents(self, texts: Sequence[str]) -> np.ndarray:
+        missing = list({text for text in texts if text not in self.vectors})
+        if missing:
+            start = time.perf_counter()
+            vectors = np.asarray(
+                self.embedder.embed_documents(missing), dtype=np.float32
+            )
+            seconds_per_text = (time.perf_counter() - start) / len(missing)
+            for text, vector in zip(missing, vectors):
+                self.vectors[text] = vector
+                self.seconds[text] = seconds_per_text
+
+        return np.stack([self.vectors[text] for text in texts])
+
+    def embed_query(self, query: str) -> np.ndarray:
+        if query not in self.query_vectors:
+            start = time.perf_counter()
+            vector = np.asarray(self.embedder.embed_query(query), dtype=np.float32)
+            self.query_seconds[query] = time.perf_counter() - start
+            self.query_vectors[query] = vector
+
+        return self.query_vectors[query]
+
+
+class _CachedRanker:
+    """Scores (query, document) pairs, caching both the scores and how long each
+    one took to compute.
+    """
+
+    def __init__(self, ranker: BaseRanker):
+        self.ranker = ranker
+        self.scores: Dict[Tuple[str, str], float] = {}
+        self.seconds: Dict[Tuple[str, str], float] = {}
+
+    def predict(self, query: str, documents: Sequence[str]) -> List[float]:
+        missing = list({doc for doc in documents if (query, doc) not in self.scores})
+        if missing:
+            start = time.perf_counter()
+            scores = self.ranker.predict(query=query, documents=missing)
+            seconds_per_doc = (time.perf_counter() - start) / len(missing)
+            for doc, score in zip(missing, scores):
+                self.scores[(query, doc)] = score
+                self.seconds[(query, doc)] = seconds_per_doc
+
+        return [self.scores[(query, doc)] for doc in documents]
+
+    def cost(self, query: str, documents: Sequence[str]) -> float:
+        return sum(self.seconds[(query, doc)] for doc in documents)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def pareto_front(
+    results: Sequence[TuningResult], quality_key: str = "ranker_precision"
+) -> List[bool]:
+    """For each result, whether it is Pareto-optimal -- i.e. no other result has
+    better (or equal) quality, query latency and index size, and is strictly better
+    in at least one of them.
+    """
+
+    def objectives(result: TuningResult) -> Tuple[float, float, float]:
+        latency = result["retriever_seconds"] + result["ranker_seconds"]
+        return (-result[quality_key], latency, result["index_megabytes"])  # type: ignore
+
+    points = [objectives(result) for result in results]
+    return [
+        not any(
+            all(o <= p for o, p in zip(other, point)) and other != point
+            for other in points
+        )
+        for point in points
+    ]
+
+
+def sweep(
+    questions: Sequence[LabelledQuestion],
+    paths: Sequence[str],
+    embedder: BaseEmbedder,
+    ranker: BaseRanker,
+    chunk_sizes: Sequence[int] = (SETTINGS.DOCUMENT_RAG_CHUNK_SIZE,),
+    chunk_overlaps: Sequence[int] = (SETTINGS.DOCUMENT_RAG_CHUNK_OVERLAP,),
+    retriever_chunks: Sequence[int] = (SETTINGS.DOCUMENT_RAG_RETRIEVER_CHUNKS,),
+    ranker_chunks: Sequence[int] = (SETTINGS.DOCUMENT_RAG_RANKER_CHUNKS,),
+    quality_key: str = "ranker_precision",
+    verbose: bool = False,
+) -> List[TuningResult]:
+    """Evaluate every combination of the given settings against the labelled
+    questions.  Configurations where 'chunk_overlap >= chunk_size' or
+    'ranker_chunks > retriever_chunks' are skipped.
+
+    Args:
+        questions: Labelled questions to evaluate.
+        paths: Local paths to the PDF documents referenced by the questions.
+        embedder: The embedder to evaluate with.
+        ranker: The ranker to evaluate with.
+        chunk_sizes: Values of DOCUMENT_RAG_CHUNK_SIZE to try.
+        chunk_overlaps: Values of DOCUMENT_RAG_CHUNK_OVERLAP to try.
+        retriever_chunks: Values of DOCUMENT_RAG_RETRIEVER_CHUNKS to try.
+        ranker_chunks: Values of DOCUMENT_RAG_RANKER_CHUNKS to try.
+        quality_key: The quality metric used for the Pareto front.
+        verbose: Whether to print progress for each configuration.
+
+    Returns:
+        One result per configuration, in the order they were evaluated.
+    """
+    pages: Dict[str, List[str]] = {}
+    parse_seconds = 0.0
+    for path in paths:
+        start = time.perf_counter()
+        pages[path] = read_pdf_pages(path)
+        parse_seconds += time.perf_counter() - start
+    cached_embedder = _CachedEmbedder(embedder)
+    cached_ranker = _CachedRanker(ranker)
+    query_vectors = _normalize(
+        np.stack([cached_embedder.embed_query(q["question"]) for q in questions])
+    )
+    query_embed_seconds = float(np.mean(list(cached_embedder.query_seconds.values())))
+    max_retriever_chunks = max(retriever_chunks)
+
+    results: List[TuningResult] = []
+    for chunk_size, chunk_overlap in itertools.product(chunk_sizes, chunk_overlaps):
+        if chunk_overlap >= chunk_size:
+            continue
+        if verbose:
+            print(f"Evaluating chunk_size={chunk_size}, chunk_overlap={chunk_overlap}")
+
+        start = time.perf_counter()
+        chunks_by_path = {
+            path: chunk_pages(
+                doc_pages,
+                path=path,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+            )
+            for path, doc_pages in pages.items()
+        }
+        chunk_seconds = time.perf_counter() - start
+        chunks = [
+            chunk for doc_chunks in chunks_by_path.values() for chunk in doc_chunks
+        ]
+        texts = [text for text, _ in chunks]
+        vectors = _normalize(cached_embedder.embed_documents(texts))
+        embed_seconds = sum(cached_embedder.seconds[text] for text in texts)
+        text_bytes = sum(
+            stored_size([text for text, _ in doc_chunks])
+            for doc_chunks in chunks_by_path.values()
+        )
+        index_megabytes = (vectors.nbytes + text_bytes) / 2**20
+
+        # Exact (brute-force) search, which matches Qdrant's local mode.
+        start = time.perf_counter()
+        similarities = query_vectors @ vectors.T
+        limit = min(max_retriever_chunks, len(chunks))
+        topk = np.argpartition(-similarities, limit - 1, axis=-1)[:, :limit]
+        topk_similarities = np.take_along_axis(similarities, topk, axis=-1)
+        topk = np.take_along_axis(topk, np.argsort(-topk_similarities), axis=-1)
+        retriever_seconds = query_embed_seconds + (
+            (time.perf_counter() - start) / len(questions)
+        )
+
+        for num_retrieved, num_ranked in itertools.product(
+            retriever_chunks, ranker_chunks
+        ):
+            if num_ranked > num_retrieved:
+                continue
+
+            recalls: List[float] = []
+            precisions: List[float] = []
+            hits: List[bool] = []
+            ranker_costs: List[float] = []
+            for question, indices in zip(questions, topk[:, :num_retrieved]):
+                query = question["question"]
+                candidates = [chunks[i] for i in indices]
+                candidate_texts = [text for text, _ in candidates]
+                scores = cached_ranker.predict(query, candidate_texts)
+                ranker_costs.append(cached_ranker.cost(query, candidate_texts))
+                ranked = [candidates[i] for i in np.argsort(scores)[::-1][:num_ranked]]
+
+                labelled = set(question["pages"])
+                covered = [
+                    any(_covers(metadata, path, page) for _, metadata in candidates)
+                    for path, page in labelled
+                ]
+                recalls.append(sum(covered) / max(len(labelled), 1))
+                relevant = [_is_relevant(metadata, question) for _, metadata in ranked]
+                precisions.append(sum(relevant) / max(len(ranked), 1))
+                hits.append(any(relevant))
+
+            results.append(
+                TuningResult(
+                    chunk_size=chunk_size,
+                    chunk_overlap=chunk_overlap,
+                    retriever_chunks=num_retrieved,
+                    ranker_chunks=num_ranked,
+                    num_chunks=len(chunks),
+                    recall=float(np.mean(recalls)),
+                    ranker_precision=float(np.mean(precisions)),
+                    hit_rate=float(np.mean(hits)),
+                    parse_seconds=parse_seconds,
+                    chunk_seconds=chunk_seconds,
+                    embed_seconds=embed_seconds,
+                    retriever_seconds=retriever_seconds,
+                    ranker_seconds=float(np.mean(ranker_costs)),
+                    index_megabytes=index_megabytes,
+                    pareto=False,
+                )
+            )
+
+    for result, is_pareto in zip(results, pareto_front(results, quality_key)):
+        result["pareto"] = is_pareto
+
+    return results
+
+
+def format_table(results: Sequence[TuningResult], pareto_only: bool = False) -> str:
+    """Format results as a Markdown table, sorted by query latency.  Pareto-optimal
+    configurations are marked with '*'.
+    """
+    columns = [
+        ("size", "chunk_size", "{}"),
+        ("overlap", "chunk_overlap", "{}"),
+        ("retrieve", "retriever_chunks", "{}"),
+        ("rank", "ranker_chunks", "{}"),
+        ("chunks", "num_chunks", "{}"),
+        ("recall", "recall", "{:.3f}"),
+        ("precision", "ranker_precision", "{:.3f}"),
+        ("hit rate", "hit_rate", "{:.3f}"),
+        ("parse (s)", "parse_seconds", "{:.3f}"),
+        ("chunk (s)", "chunk_seconds", "{:.3f}"),
+        ("embed (s)", "embed_seconds", "{:.3f}"),
+        ("retrieve (ms)", "retriever_seconds", "{:.2f}"),
+        ("rank (ms)", "ranker_seconds", "{:.2f}"),
+        ("index (MB)", "index_megabytes", "{:.2f}"),
+    ]
+    rows = sorted(
+        (r for r in results if r["pareto"] or not pareto_only),
+        key=lambda r: r["retriever_seconds"] + r["ranker_seconds"],
+    )
+    lines = [
+        "| pareto | " + " | ".join(name for name, _, _ in columns) + " |",
+        "|---" * (len(columns) + 1) + "|",
+    ]
+    for row in rows:
+        values = []
+        for _, key, fmt in columns:
+            value = row[key]  # type: ignore
+            if key in ("retriever_seconds", "ranker_seconds"):
+                value *= 1000
+            values.append(fmt.format(value))
+        marker = "*" if row["pareto"] else ""
+        lines.append(f"| {marker} | " + " | ".join(values) + " |")
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from document_rag.embedder import load_embedder
+    from document_rag.ranker import load_ranker
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("questions", type=str, help="Path to labelled questions.")
+    parser.add_argument("--documents", type=str, nargs="+", required=True)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[64, 128, 256])
+    parser.add_argument("--chunk-overlaps", type=int, nargs="+", default=[0, 32, 64])
+    parser.add_argument(
+        "--retriever-chunks", type=int, nargs="+", default=[25, 50, 100]
+    )
+    parser.add_argument("--ranker-chunks", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument(
+        "--quality",
+        type=str,
+        default="ranker_precision",
+        choices=["recall", "ranker_precision", "hit_rate"],
+    )
+    parser.add_argument("--pareto-only", action="store_true")
+    parser.add_argument("--output", type=str, default=None, help="Save results JSON.")
+    args = parser.parse_args()
+
+    results = sweep(
+        questions=load_questions(args.questions),
+        paths=args.documents,
+        embedder=load_embedder(
+            type=SETTINGS.DOCUMENT_RAG_EMBEDDER_TYPE,
+            model=SETTINGS.DOCUMENT_RAG_EMBEDDER_MODEL,
+            batch_size=SETTINGS.DOCUMENT_RAG_EMBEDDER_BATCH_SIZE,
+            workers=SETTINGS.DOCUMENT_RAG_EMBEDDER_WORKERS,
+        ),
+        ranker=load_ranker(
+            type=SETTINGS.DOCUMENT_RAG_RANKER_TYPE,
+            model=SETTINGS.DOCUMENT_RAG_RANKER_MODEL,
+        ),
+        chunk_sizes=args.chunk_sizes,
+        chunk_overlaps=args.chunk_overlaps,
+        retriever_chunks=args.retriever_chunks,
+        ranker_chunks=args.ranker_chunks,
+        quality_key=args.quality,
+        verbose=True,
+    )
+    print(format_table(results, pareto_only=args.pareto_only))
+    output: Optional[str] = args.output
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -8,6 +8,14 @@ class TextMetadata(TypedDict):
     page_range: Tuple[int, int]
 
 
+class TextSpan(TypedDict):
+    """Location of a chunk of text, as a range of bytes within a stored document."""
+
+    doc_id: str
+    start: int
+    end: int
+
+
 class SearchResult(TypedDict):
     """Description of a single text chunk, which is returned by a vector DB search."""
 
@@ -1,11 +1,13 @@
 from enum import Enum
-from typing import Union
+from typing import Optional, Union
 
+from document_rag.embedder import BaseEmbedder
 from document_rag.vector_db.base import (  # noqa: F401
     BaseVectorDB,
     SearchResult,
     TextMetadata,
 )
+from document_rag.vector_db.results import SearchResults  # noqa: F401
 
 
 class VectorDBType(str, Enum):
@@ -13,7 +15,10 @@ class VectorDBType(str, Enum):
 
 
 def create_vector_db(
-    type: Union[VectorDBType, str], cache_dir: str, exist_ok: bool = False
+    type: Union[VectorDBType, str],
+    cache_dir: str,
+    exist_ok: bool = False,
+    embedder: Optional[BaseEmbedder] = None,
 ) -> BaseVectorDB:
     if isinstance(type, str):
         type = VectorDBType(type)
@@ -21,7 +26,9 @@ def create_vector_db(
     # fmt: off
     if type == VectorDBType.QDRANT:
         from document_rag.vector_db.qdrant import QdrantVectorDB
-        return QdrantVectorDB.create(cache_dir=cache_dir, exist_ok=exist_ok)
+        return QdrantVectorDB.create(
+            cache_dir=cache_dir, exist_ok=exist_ok, embedder=embedder
+        )
     else:
         raise ValueError(f"Unknown vector DB type: {type}")
     # fmt: on
@@ -1,15 +1,20 @@
 from __future__ import annotations
 
 import os
+import time
 from abc import abstractmethod
-from typing import Any, Callable, List, Sequence, Tuple, TypeVar
+from typing import Any, Callable, List, Optional, Sequence, Tuple, TypeVar
 
+import numpy as np
 from pypdf import PdfReader
 from tqdm import tqdm
 from typing_extensions import Self
 
+from document_rag.embedder import BaseEmbedder
+from document_rag.profiling import IngestProfiler, profile_stage
 from document_rag.settings import Settings
 from document_rag.types import SearchResult, TextMetadata
+from document_rag.vector_db.results import SearchResults
 
 T = TypeVar("T")
 
@@ -29,13 +34,46 @@ class BaseVectorDB:
 
     @classmethod
     @abstractmethod
-    def create(cls, cache_dir: str, exist_ok: bool = False) -> Self:
+    def create(
+        cls,
+        cache_dir: str,
+        exist_ok: bool = False,
+        embedder: Optional[BaseEmbedder] = None,
+    ) -> Self:
         pass
 
     @abstractmethod
-    def add_documents(self, documents: Sequence[Tuple[str, TextMetadata]]) -> None:
+    def add_documents(
+        self, documents: Sequence[Tuple[str, TextMetadata]], verbose: bool = False
+    ) -> None:
         """Add one or more documents to the DB, along with associated metadata."""
-        """Add a document to the DB, along with associated metadata."""
+
+    @abstractmethod
+    def add_embeddings(
+        self,
+        documents: Sequence[Tuple[str, TextMetadata]],
+        embeddings: np.ndarray,
+        model: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+    ) -> None:
+        """Add one or more documents to the DB, using precomputed embeddings.
+
+        Args:
+            documents: The document texts, along with associated metadata.
+            embeddings: Array of shape (len(documents), dim) with the embedding of
+                each document.
+            model: Name of the model that computed the embeddings.  If given, it
+                must match the DB's embedding model.
+            chunk_size: Chunk size that the documents were split with.  If given,
+                it must match the DB's chunk settings.
+            chunk_overlap: Chunk overlap that the documents were split with.  If
+                given, it must match the DB's chunk settings.
+
+        Raises:
+            ValueError: If the embeddings don't match the DB's embedding model or
+                chunk settings.
+        """
 
     @abstractmethod
     def search(self, query: str, limit: int = 10) -> List[SearchResult]:
@@ -51,20 +89,58 @@ class BaseVectorDB:
             ValueError: If the DB is empty.
         """
 
-    def add_pdf_documents(self, paths: Sequence[str], verbose: bool = False) -> None:
+    @abstractmethod
+    def export_snapshot(self, path: str) -> None:
+        """Export the full index (vectors, payloads and text) to a single snapshot
+        file, which can be copied to other machines.  See 'vector_db.snapshot'.
+        """
+
+    @abstractmethod
+    def import_snapshot(self, path: str) -> None:
+        """Add all documents from a snapshot file (see 'export_snapshot') to the DB.
+
+        Raises:
+            ValueError: If the snapshot was built with a different format version,
+                embedding model, or chunk settings than this DB uses.
+        """
+
+    def search_results(self, query: str, limit: int = 10) -> SearchResults:
+        """Like 'search', but returns columnar results, whose text and metadata are
+        only loaded when needed.  By default, this wraps 'search'.  DBs that store
+        text separately should override it, to avoid loading text up front.
+        """
+        return SearchResults.from_list(self.search(query, limit=limit))
+
+    def add_pdf_documents(
+        self,
+        paths: Sequence[str],
+        verbose: bool = False,
+        profiler: Optional[IngestProfiler] = None,
+    ) -> None:
         """Add one or more PDF documents to the DB, keeping track of text metadata.
 
+        If a 'profiler' is given, each file is extracted, chunked and indexed
+        separately, so that time and memory can be attributed to each file.
+
         TODO:
         - Allow passing custom encoder/decoder functions at this level.  For
           simplicity, we just use the default ones for now.
         - Parallelize the PDF extraction step.  I expect this to be a bottleneck,
           both for speed and memory footprint.
         """
+        if profiler is not None:
+            for path in tqdm(paths, disable=(not verbose), desc="Ingesting PDFs"):
+                with profiler.profile_file(path):
+                    documents = read_pdf_document(path, profiler=profiler)
+                    with profiler.stage("index"):
+                        self.add_documents(documents, verbose=verbose)
+            return
+
         extracted: List[Tuple[str, TextMetadata]] = []
         for path in tqdm(paths, disable=(not verbose), desc="Extracting PDFs"):
             extracted += read_pdf_document(path)
 
-        self.add_documents(extracted)
+        self.add_documents(extracted, verbose=verbose)
 
 
 def _format_text(text: str) -> str:
@@ -79,7 +155,37 @@ def _format_text(text: str) -> str:
     )
 
 
-def read_pdf_document(
+def read_pdf_pages(path: str, profiler: Optional[IngestProfiler] = None) -> List[str]:
+    """Extracts the raw text from each page of a PDF document.  If a 'profiler' is
+    given, the extraction time and number of images of each page are recorded.
+    """
+    _, ext = os.path.splitext(path)
+    if ext.lower() != ".pdf":
+        raise ValueError(f"File extension '{ext}' not supported. Must be PDF.")
+    elif not os.path.exists(path):
+        raise FileNotFoundError(f"File '{path}' does not exist.")
+
+    reader = PdfReader(path)
+    if profiler is None:
+        return [page.extract_text() for page in reader.pages]
+
+    texts: List[str] = []
+    for i, page in enumerate(reader.pages):
+        start = time.perf_counter()
+        text = page.extract_text()
+        seconds = time.perf_counter() - start
+        try:
+            images = len(page.images)
+        except Exception:
+            # Profiling should never break ingestion, e.g. for malformed images.
+            images = 0
+        profiler.record_page(i, seconds=seconds, text=text, images=images)
+        texts.append(text)
+    return texts
+
+
+def chunk_pages(
+    pages: Sequence[str],
     path: str,
     chunk_size: int = CHUNK_SIZE,
     chunk_overlap: int = CHUNK_OVERLAP,
@@ -87,25 +193,12 @@ def read_pdf_document(
     encoder: Callable[[str], list] = lambda x: x.split(" "),
     decoder: Callable[[Sequence], str] = lambda x: " ".join(x),
 ) -> List[Tuple[str, TextMetadata]]:
-    """Extracts text from a PDF document, keeping track of which page numbers each
-    chunk of text came from.  The page range is contained in the metadata for each
-    text chunk.
-
-    NOTE: By default, the chunk size is measured in words -- not characters or tokens.
-    This choice is agnostic to the language models that are used downstream and
-    reasonably fast, since we can just split on whitespace.  Other tokenizers (e.g.
-    HuggingFace tokenizers) can be used by passing custom encoder/decoder functions.
+    """Splits the text of a document's pages into (overlapping) chunks, keeping
+    track of which page numbers each chunk of text came from.  See
+    'read_pdf_document' for details.
     """
     result: List[Tuple[str, TextMetadata]] = []
-
-    _, ext = os.path.splitext(path)
-    if ext.lower() != ".pdf":
-        raise ValueError(f"File extension '{ext}' not supported. Must be PDF.")
-    elif not os.path.exists(path):
-        raise FileNotFoundError(f"File '{path}' does not exist.")
-
-    reader = PdfReader(path)
-    num_pages = len(reader.pages)
+    num_pages = len(pages)
     current_page = 0
     start_page = 0
     tokens: List[Any] = []
@@ -114,7 +207,7 @@ def read_pdf_document(
         # If we don't have enough words to fill a chunk, add the next page of words.
         # Otherwise, add the chunk to the output and continue to the next one.
         if len(tokens) < chunk_size:
-            text = preprocessor(reader.pages[current_page].extract_text())
+            text = preprocessor(pages[current_page])
             tokens += encoder(preprocessor(text))
             current_page += 1
         else:
@@ -133,3 +226,41 @@ def read_pdf_document(
         )
 
     return result
+
+
+def read_pdf_document(
+    path: str,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    preprocessor: Callable[[str], str] = _format_text,
+    encoder: Callable[[str], list] = lambda x: x.split(" "),
+    decoder: Callable[[Sequence], str] = lambda x: " ".join(x),
+    profiler: Optional[IngestProfiler] = None,
+) -> List[Tuple[str, TextMetadata]]:
+    """Extracts text from a PDF document, keeping track of which page numbers each
+    chunk of text came from.  The page range is contained in the metadata for each
+    text chunk.
+
+    NOTE: By default, the chunk size is measured in words -- not characters or tokens.
+    This choice is agnostic to the language models that are used downstream and
+    reasonably fast, since we can just split on whitespace.  Other tokenizers (e.g.
+    HuggingFace tokenizers) can be used by passing custom encoder/decoder functions.
+
+    If a 'profiler' is given, the 'extract' and 'chunk' stages are profiled, and
+    this must be called within 'profiler.profile_file'.
+    """
+    with profile_stage(profiler, "extract"):
+        pages = read_pdf_pages(path, profiler=profiler)
+    with profile_stage(profiler, "chunk"):
+        chunks = chunk_pages(
+            pages,
+            path=path,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            preprocessor=preprocessor,
+            encoder=encoder,
+            decoder=decoder,
+        )
+    if profiler is not None:
+        profiler.record_chunks(len(chunks))
+    return chunks
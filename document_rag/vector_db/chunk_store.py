@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import mmap
+import os
+import threading
+import uuid
+from typing import Dict, List, Sequence, Tuple
+
+from document_rag.types import TextSpan
+
+
+def _overlap(prev: bytes, text: bytes) -> int:
+    """Length of the longest suffix of 'prev' that is also a prefix of 'text'."""
+    head = text[:16]
+    start = prev.find(head)
+    while start != -1:
+        if text.startswith(prev[start:]):
+            return len(prev) - start
+        start = prev.find(head, start + 1)
+
+    # Suffixes shorter than 'head' aren't found by the search above.
+    for start in range(max(len(prev) - len(head) + 1, 0), len(prev)):
+        if text.startswith(prev[start:]):
+            return len(prev) - start
+    return 0
+
+
+def _merge(chunks: Sequence[str]) -> Tuple[List[bytes], List[Tuple[int, int]]]:
+    """Merge consecutive chunks, dropping the overlap between neighbours.  Returns
+    the parts to write, and the (start, end) byte range of each chunk.
+    """
+    parts: List[bytes] = []
+    ranges: List[Tuple[int, int]] = []
+    size = 0
+    prev = b""
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        overlap = _overlap(prev, data)
+        start = size - overlap
+        parts.append(data[overlap:])
+        size += len(data) - overlap
+        ranges.append((start, start + len(data)))
+        prev = data
+    return parts, ranges
+
+
+def stored_size(chunks: Sequence[str]) -> int:
+    """Number of bytes that 'ChunkStore.add' stores for consecutive chunks of a
+    single document.
+    """
+    parts, _ = _merge(chunks)
+    return sum(len(part) for part in parts)
+
+
+class ChunkStore:
+    """Stores the text of each document once, rather than once per chunk.
+
+    Consecutive chunks of a document typically overlap (by DOCUMENT_RAG_CHUNK_OVERLAP
+    words), so storing every chunk in full duplicates much of the text.  Instead, the
+    chunks are merged into a single UTF-8 file per document, and each chunk is
+    described by a byte range (TextSpan) within that file.  Files are memory-mapped
+    for reading, so only the pages holding requested chunks are loaded into memory.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._mmaps: Dict[str, mmap.mmap] = {}
+
+    def _path(self, doc_id: str) -> str:
+        return os.path.join(self.directory, f"{doc_id}.txt")
+
+    def add(self, chunks: Sequence[str]) -> List[TextSpan]:
+        """Store consecutive chunks of a single document, and return the location
+        of each chunk within the stored document.
+        """
+        doc_id = uuid.uuid4().hex
+        parts, ranges = _merge(chunks)
+        with open(self._path(doc_id), "wb") as f:
+            f.write(b"".join(parts))
+
+        return [TextSpan(doc_id=doc_id, start=start, end=end) for start, end in ranges]
+
+    def _mmap(self, doc_id: str) -> mmap.mmap:
+        with self._lock:
+            if doc_id not in self._mmaps:
+                with open(self._path(doc_id), "rb") as f:
+                    self._mmaps[doc_id] = mmap.mmap(
+                        f.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+            return self._mmaps[doc_id]
+
+    def get(self, span: TextSpan) -> str:
+        """Load the text for a single chunk."""
+        if span["start"] == span["end"]:
+            # Also avoids memory-mapping empty files, which is not allowed.
+            return ""
+        data = self._mmap(span["doc_id"])[span["start"] : span["end"]]
+        return data.decode("utf-8")
+
+    def get_many(self, spans: Sequence[TextSpan]) -> List[str]:
+        """Load the text for several chunks."""
+        return [self.get(span) for span in spans]
+
+    def size(self) -> int:
+        """Total size (in bytes) of all stored documents."""
+        return sum(
+            os.path.getsize(os.path.join(self.directory, name))
+            for name in os.listdir(self.directory)
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            for data in self._mmaps.values():
+                data.close()
+            self._mmaps = {}
@@ -1,38 +1,357 @@
 from __future__ import annotations
 
+import itertools
+import json
 import os
-from typing import Any, Dict, List, Sequence, Tuple, cast
+import uuid
+from typing import Iterator, List, Optional, Sequence, Tuple, TypedDict, cast
 
+import numpy as np
 from qdrant_client import QdrantClient
+from qdrant_client.http import models
 from typing_extensions import Self
 
-from document_rag.vector_db.base import BaseVectorDB, SearchResult, TextMetadata
+from document_rag.embedder import BaseEmbedder, load_embedder
+from document_rag.settings import Settings
+from document_rag.types import TextSpan
+from document_rag.vector_db.base import (
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    BaseVectorDB,
+    SearchResult,
+    TextMetadata,
+)
+from document_rag.vector_db.chunk_store import ChunkStore
+from document_rag.vector_db.results import SearchResults
+from document_rag.vector_db.snapshot import (
+    Snapshot,
+    SnapshotManifest,
+    check_manifest,
+    create_manifest,
+    write_snapshot,
+)
 
+SETTINGS = Settings()
 # TODO: Move to configurable Settings class
 COLLECTION_NAME = "documents"
+CHUNK_STORE_DIR = "chunks"
+EMBEDDER_RECORD_FILE = "embedder.json"
+# Number of points to read from / write to Qdrant at once, for snapshots.
+SNAPSHOT_BATCH_SIZE = 1024
+
+
+class EmbedderRecord(TypedDict):
+    """Record of the embedding model and chunk settings that a vector DB was built
+    with.  Documents ingested later must use the same ones.
+    """
+
+    model: str
+    dim: int
+    chunk_size: int
+    chunk_overlap: int
+
+
+def _has_collection(client: QdrantClient) -> bool:
+    try:
+        client.get_collection(collection_name=COLLECTION_NAME)
+    except ValueError:
+        return False
+    return True
+
+
+def _check_embedder_record(
+    cache_dir: str, embedder: BaseEmbedder, client: QdrantClient
+) -> EmbedderRecord:
+    """Check that 'embedder' and the current chunk settings match the record in
+    'cache_dir'.  If there is no record yet (i.e. the DB is new), create one.
+
+    Raises:
+        ValueError: If the record doesn't match, or if the DB already has documents
+            but no record.  (DBs built before records were kept store documents in
+            a different layout, and must be rebuilt.)
+    """
+    path = os.path.join(cache_dir, EMBEDDER_RECORD_FILE)
+    record = EmbedderRecord(
+        model=embedder.model,
+        dim=embedder.dim,
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+    )
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            existing = cast(EmbedderRecord, json.load(f))
+        if existing != record:
+            raise ValueError(
+                f"Vector DB at '{cache_dir}' was built with {existing}, but the "
+                f"current embedder and chunk settings are {record}."
+            )
+    elif _has_collection(client):
+        raise ValueError(
+            f"Vector DB at '{cache_dir}' has no '{EMBEDDER_RECORD_FILE}', so it was "
+            "built by an older version with an incompatible layout.  Delete it, and "
+            "ingest the documents again."
+        )
+    else:
+        with open(path, "w") as f:
+            json.dump(record, f)
+
+    return record
 
 
 class QdrantVectorDB(BaseVectorDB):
     """Implementation of a Qdrant vector DB, which is consistent with the
     BaseVectorDB interface.
+
+    Only vectors and metadata are stored in Qdrant.  The text of each document is
+    stored once in a ChunkStore, and each point's payload refers to its chunk by
+    (doc_id, start, end) offsets.  Text is loaded on demand when searching.
     """
 
-    def __init__(self, client: QdrantClient):
+    def __init__(
+        self,
+        client: QdrantClient,
+        chunk_store: ChunkStore,
+        embedder: BaseEmbedder,
+        chunk_size: int = CHUNK_SIZE,
+        chunk_overlap: int = CHUNK_OVERLAP,
+    ):
         self.client = client
+        self.chunk_store = chunk_store
+        self.embedder = embedder
+        # Chunk settings that the documents in this DB were split with.
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
 
     @classmethod
-    def create(cls, cache_dir: str, exist_ok: bool = False) -> Self:
+    def create(
+        cls,
+        cache_dir: str,
+        exist_ok: bool = False,
+        embedder: Optional[BaseEmbedder] = None,
+    ) -> Self:
+        """Create (or reopen) a Qdrant vector DB in 'cache_dir'.
+
+        Args:
+            cache_dir: The directory to store the DB in.
+            exist_ok: Whether to allow the DB to already exist on disk.
+            embedder: The embedder for documents and queries.  If None, it is loaded
+                from the DOCUMENT_RAG_EMBEDDER_* settings.
+
+        Raises:
+            FileExistsError: If the DB already exists, and 'exist_ok' is False.
+            ValueError: If the DB was built with a different embedding model or
+                chunk settings, or by an older version with an incompatible layout.
+        """
         os.makedirs(cache_dir, exist_ok=exist_ok)
-        return cls(client=QdrantClient(path=cache_dir))
+        if embedder is None:
+            embedder = load_embedder(
+                type=SETTINGS.DOCUMENT_RAG_EMBEDDER_TYPE,
+                model=SETTINGS.DOCUMENT_RAG_EMBEDDER_MODEL,
+                batch_size=SETTINGS.DOCUMENT_RAG_EMBEDDER_BATCH_SIZE,
+                workers=SETTINGS.DOCUMENT_RAG_EMBEDDER_WORKERS,
+            )
+        client = QdrantClient(path=cache_dir)
+        try:
+            record = _check_embedder_record(cache_dir, embedder, client)
+        except Exception:
+            client.close()
+            raise
 
-    def add_documents(self, documents: Sequence[Tuple[str, TextMetadata]]) -> None:
+        return cls(
+            client=client,
+            chunk_store=ChunkStore(os.path.join(cache_dir, CHUNK_STORE_DIR)),
+            embedder=embedder,
+            chunk_size=record["chunk_size"],
+            chunk_overlap=record["chunk_overlap"],
+        )
+
+    def _ensure_collection(self) -> None:
+        if not _has_collection(self.client):
+            self.client.create_collection(
+                collection_name=COLLECTION_NAME,
+                vectors_config=models.VectorParams(
+                    size=self.embedder.dim, distance=models.Distance.COSINE
+                ),
+            )
+
+    def add_documents(
+        self, documents: Sequence[Tuple[str, TextMetadata]], verbose: bool = False
+    ) -> None:
         """Add one or more documents to the DB, along with associated metadata."""
-        _documents = [doc for doc, _ in documents]
-        metadata = [metadata for _, metadata in documents]
-        self.client.add(
+        embeddings = self.embedder.embed_documents(
+            [text for text, _ in documents], verbose=verbose
+        )
+        self.add_embeddings(documents, embeddings)
+
+    def add_embeddings(
+        self,
+        documents: Sequence[Tuple[str, TextMetadata]],
+        embeddings: np.ndarray,
+        model: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+    ) -> None:
+        """Add one or more documents to the DB, using precomputed embeddings.
+        Consecutive chunks from the same path are stored as a single document.
+
+        Raises:
+            ValueError: If the embeddings don't match the DB's embedding model or
+                chunk settings.
+        """
+        if model is not None and model != self.embedder.model:
+            raise ValueError(
+                f"Embeddings were computed with model '{model}', but the DB uses "
+                f"'{self.embedder.model}'."
+            )
+        for name, value, expected in [
+            ("chunk_size", chunk_size, self.chunk_size),
+            ("chunk_overlap", chunk_overlap, self.chunk_overlap),
+        ]:
+            if value is not None and value != expected:
+                raise ValueError(
+                    f"Documents were split with {name}={value}, but the DB uses "
+                    f"{name}={expected}."
+                )
+        if embeddings.shape != (len(documents), self.embedder.dim):
+            raise ValueError(
+                f"Expected embeddings with shape {(len(documents), self.embedder.dim)}"
+                f", but got {embeddings.shape}."
+            )
+
+        spans: List[TextSpan] = []
+        for _, group in itertools.groupby(documents, key=lambda d: d[1]["path"]):
+            spans += self.chunk_store.add([text for text, _ in group])
+
+        self._ensure_collection()
+        self.client.upload_records(
             collection_name=COLLECTION_NAME,
-            documents=_documents,
-            metadata=cast(List[Dict[str, Any]], metadata),  # For mypy
+            records=(
+                models.Record(
+                    id=uuid.uuid4().hex,
+                    vector=vector.tolist(),
+                    payload={**metadata, **span},
+                )
+                for (_, metadata), span, vector in zip(documents, spans, embeddings)
+            ),
+            wait=True,
+        )
+
+    def _manifest(self, num_points: int = 0) -> SnapshotManifest:
+        return create_manifest(
+            embedding_model=self.embedder.model,
+            embedding_dim=self.embedder.dim,
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
+            num_points=num_points,
+        )
+
+    def _scroll(self) -> Iterator[List[models.Record]]:
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=COLLECTION_NAME,
+                limit=SNAPSHOT_BATCH_SIZE,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            yield records
+            if offset is None:
+                break
+
+    def export_snapshot(self, path: str) -> None:
+        """Export the full index (vectors, payloads and text) to a single snapshot
+        file.  See 'document_rag.vector_db.snapshot' for the file layout.  Points are
+        streamed to the snapshot in batches, so the index isn't loaded into memory.
+
+        Raises:
+            ValueError: If the DB is empty.
+        """
+        if not _has_collection(self.client):
+            raise ValueError("The DB is empty.")
+
+        num_points = self.client.count(collection_name=COLLECTION_NAME).count
+        write_snapshot(
+            path,
+            manifest=self._manifest(num_points=num_points),
+            batches=(
+                (
+                    np.array(
+                        [cast(List[float], record.vector) for record in records],
+                        dtype=np.float32,
+                    ).reshape(-1, self.embedder.dim),
+                    [
+                        {"id": record.id, "payload": record.payload}
+                        for record in records
+                    ],
+                )
+                for records in self._scroll()
+            ),
+            chunks_dir=self.chunk_store.directory,
+        )
+
+    def import_snapshot(self, path: str) -> None:
+        """Add all documents from a snapshot file to the DB.  Vectors are memory-
+        mapped from the snapshot, and uploaded to Qdrant in batches.  Point IDs are
+        preserved, so importing the same snapshot twice does not duplicate points.
+
+        Raises:
+            ValueError: If the snapshot was built with a different format version,
+                embedding model, or chunk settings than this DB uses.
+        """
+        with Snapshot(path) as snapshot:
+            check_manifest(snapshot.manifest, self._manifest())
+            vectors = snapshot.vectors()
+            # Copy text first, so that no point ever refers to a missing chunk.
+            snapshot.copy_chunks(self.chunk_store.directory)
+
+            self._ensure_collection()
+            self.client.upload_records(
+                collection_name=COLLECTION_NAME,
+                records=(
+                    models.Record(
+                        id=point["id"],
+                        vector=vector.tolist(),
+                        payload=point["payload"],
+                    )
+                    for vector, point in zip(vectors, snapshot.payloads())
+                ),
+                batch_size=SNAPSHOT_BATCH_SIZE,
+                wait=True,
+            )
+
+    def search_results(self, query: str, limit: int = 10) -> SearchResults:
+        """Query the DB, and return up to 'limit' most similar results as columnar
+        'SearchResults'.  Text is loaded from the chunk store only when needed.
+
+        Raises:
+            ValueError: If the DB is empty.
+        """
+        collection_info = self.client.get_collection(collection_name=COLLECTION_NAME)
+        if collection_info.segments_count == 0:
+            raise ValueError("The DB is empty.")
+
+        points = self.client.search(
+            collection_name=COLLECTION_NAME,
+            query_vector=self.embedder.embed_query(query).tolist(),
+            limit=limit,
+            with_payload=True,
+        )
+        num_points = len(points)
+        payloads = [cast(dict, point.payload) for point in points]
+        return SearchResults(
+            ids=np.arange(num_points),
+            scores=np.fromiter(
+                (point.score for point in points), dtype=np.float64, count=num_points
+            ),
+            starts=np.fromiter(
+                (p["start"] for p in payloads), dtype=np.int64, count=num_points
+            ),
+            ends=np.fromiter(
+                (p["end"] for p in payloads), dtype=np.int64, count=num_points
+            ),
+            payloads=payloads,
+            text_loader=self.chunk_store.get_many,
         )
 
     def search(self, query: str, limit: int = 10) -> List[SearchResult]:
@@ -47,18 +366,4 @@ class QdrantVectorDB(BaseVectorDB):
         Raises:
             ValueError: If the DB is empty.
         """
-        collection_info = self.client.get_collection(collection_name=COLLECTION_NAME)
-        if collection_info.segments_count == 0:
-            raise ValueError("The DB is empty.")
-
-        results = self.client.query(
-            collection_name=COLLECTION_NAME, query_text=query, limit=limit
-        )
-        return [
-            SearchResult(
-                text=result.document,
-                similarity=result.score,
-                metadata=cast(TextMetadata, result.metadata),
-            )
-            for result in results
-        ]
+        return self.search_results(query, limit=limit).to_list()
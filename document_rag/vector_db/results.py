@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from document_rag.types import SearchResult, TextMetadata, TextSpan
+
+
+def _page_range(page_range: Sequence[int]) -> Tuple[int, int]:
+    start, end = page_range
+    return int(start), int(end)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the 'k' largest scores, sorted by decreasing score.  Uses a
+    partial sort, so only the top 'k' scores are ever fully sorted.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    indices = np.argpartition(scores, len(scores) - k)[len(scores) - k :]
+    return indices[np.argsort(scores[indices])[::-1]]
+
+
+class SearchResults:
+    """Columnar search results, stored as arrays of row ids, scores and text
+    offsets, instead of one 'SearchResult' dict per result.
+
+    Text and metadata are only materialized when requested.  Selecting a subset of
+    results ('take') only indexes the arrays -- payloads and any text loaded so far
+    are shared with the original results, rather than copied.  Use 'to_list' to
+    convert to 'SearchResult' dicts at API boundaries.
+
+    Args:
+        ids: Row of each result in 'payloads'.
+        scores: Similarity score of each result.
+        starts: Start offset of each result's text in its stored document (see
+            'TextSpan'), or -1 if the text is not stored separately.
+        ends: End offset of each result's text, or -1.
+        payloads: Raw metadata for each row, with 'path' and 'page_range' keys (and
+            'doc_id' for rows with text offsets).
+        texts: Text for any rows that are already loaded, keyed by row.
+        text_loader: Function that loads the text of several spans at once.
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        scores: np.ndarray,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        payloads: Sequence[Mapping[str, Any]],
+        texts: Optional[Dict[int, str]] = None,
+        text_loader: Optional[Callable[[Sequence[TextSpan]], List[str]]] = None,
+    ):
+        self.ids = ids
+        self.scores = scores
+        self.starts = starts
+        self.ends = ends
+        self._payloads = payloads
+        self._texts = {} if texts is None else texts
+        self._text_loader = text_loader
+
+    @classmethod
+    def from_list(cls, results: Sequence[SearchResult]) -> SearchResults:
+        """Convert 'SearchResult' dicts (which must include their text)."""
+        num_results = len(results)
+        starts = np.full(num_results, -1, dtype=np.int64)
+        ends = np.full(num_results, -1, dtype=np.int64)
+        payloads = [dict(result["metadata"]) for result in results]
+
+        return cls(
+            ids=np.arange(num_results),
+            scores=np.array([r["similarity"] for r in results], dtype=np.float64),
+            starts=starts,
+            ends=ends,
+            payloads=payloads,
+            texts={i: result["text"] for i, result in enumerate(results)},
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def take(
+        self, indices: np.ndarray, scores: Optional[np.ndarray] = None
+    ) -> SearchResults:
+        """Select a subset of results, optionally replacing their scores."""
+        return SearchResults(
+            ids=self.ids[indices],
+            scores=self.scores[indices] if scores is None else scores,
+            starts=self.starts[indices],
+            ends=self.ends[indices],
+            payloads=self._payloads,
+            texts=self._texts,
+            text_loader=self._text_loader,
+        )
+
+    def top_k(self, k: int) -> SearchResults:
+        """The 'k' highest-scoring results, sorted by decreasing score."""
+        return self.take(top_k_indices(self.scores, k))
+
+    def _span(self, i: int) -> TextSpan:
+        return TextSpan(
+            doc_id=self._payloads[self.ids[i]]["doc_id"],
+            start=int(self.starts[i]),
+            end=int(self.ends[i]),
+        )
+
+    def texts(self) -> List[str]:
+        """Text of each result.  Any text that isn't loaded yet is loaded with a
+        single call to the text loader, and cached.
+        """
+        missing = [i for i, row in enumerate(self.ids) if row not in self._texts]
+        if missing:
+            if self._text_loader is None:
+                raise ValueError("Text is not loaded, and there is no text loader.")
+            spans = [self._span(i) for i in missing]
+            for i, text in zip(missing, self._text_loader(spans)):
+                self._texts[self.ids[i]] = text
+        return [self._texts[row] for row in self.ids]
+
+    def metadata(self, i: int) -> TextMetadata:
+        payload = self._payloads[self.ids[i]]
+        return TextMetadata(
+            path=payload["path"],
+            page_range=_page_range(payload["page_range"]),
+        )
+
+    def to_list(self) -> List[SearchResult]:
+        """Convert to 'SearchResult' dicts, loading any text that isn't loaded yet."""
+        return [
+            SearchResult(
+                text=text, similarity=float(self.scores[i]), metadata=self.metadata(i)
+            )
+            for i, text in enumerate(self.texts())
+        ]
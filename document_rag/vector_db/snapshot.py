@@ -0,0 +1,239 @@
+"""Versioned snapshots of a vector DB, for bringing up new serving nodes quickly.
+
+A snapshot is a single, uncompressed tar file with the following members:
+    manifest.json   -- format version, and the settings the index was built with
+    vectors.npy     -- float32 array of shape (num_points, embedding_dim)
+    payloads.jsonl  -- one JSON object per point, in the same order as 'vectors.npy'
+    chunks/*.txt    -- the chunk store (see 'ChunkStore')
+
+The tar is left uncompressed, so that 'vectors.npy' can be memory-mapped directly
+from the snapshot file, without extracting (or reading) it all up front.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Sequence,
+    Tuple,
+    TypedDict,
+    cast,
+)
+
+import numpy as np
+
+from document_rag import VERSION
+
+# Increment when the snapshot layout changes.  Snapshots with a different format
+# version are rejected on import.
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+PAYLOADS_FILE = "payloads.jsonl"
+CHUNKS_DIR = "chunks"
+
+
+class SnapshotManifest(TypedDict):
+    format_version: int
+    # Version of 'document_rag' that wrote the snapshot (informational only).
+    document_rag_version: str
+    embedding_model: str
+    embedding_dim: int
+    chunk_size: int
+    chunk_overlap: int
+    num_points: int
+
+
+def check_manifest(manifest: SnapshotManifest, expected: SnapshotManifest) -> None:
+    """Check that a snapshot is compatible with the DB it is imported into.
+
+    Raises:
+        ValueError: If the format version, embedding model or chunk settings differ.
+    """
+    keys = [
+        "format_version",
+        "embedding_model",
+        "embedding_dim",
+        "chunk_size",
+        "chunk_overlap",
+    ]
+    mismatches = [
+        f"{key}={manifest[key]!r} (expected {expected[key]!r})"  # type: ignore
+        for key in keys
+        if manifest[key] != expected[key]  # type: ignore
+    ]
+    if mismatches:
+        raise ValueError(f"Incompatible snapshot: {', '.join(mismatches)}.")
+
+
+def write_snapshot(
+    path: str,
+    manifest: SnapshotManifest,
+    batches: Iterable[Tuple[np.ndarray, Sequence[Dict[str, Any]]]],
+    chunks_dir: str,
+) -> None:
+    """Write a snapshot to 'path'.  See the module docstring for the layout.
+
+    Points are given as batches of (vectors, payloads), and written to disk as they
+    arrive, so the whole index is never held in memory.  The total number of points
+    must equal 'manifest["num_points"]'.
+
+    Raises:
+        ValueError: If the number of points doesn't match the manifest.
+    """
+    num_points = manifest["num_points"]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        vectors_path = os.path.join(tmp_dir, VECTORS_FILE)
+        vectors = np.lib.format.open_memmap(
+            vectors_path,
+            mode="w+",
+            dtype=np.float32,
+            shape=(num_points, manifest["embedding_dim"]),
+        )
+        payloads_path = os.path.join(tmp_dir, PAYLOADS_FILE)
+        written = 0
+        with open(payloads_path, "w") as f:
+            for batch_vectors, batch_payloads in batches:
+                end = written + len(batch_payloads)
+                if end > num_points:
+                    raise ValueError(f"Expected {num_points} points, but got more.")
+                vectors[written:end] = batch_vectors
+                for payload in batch_payloads:
+                    f.write(json.dumps(payload) + "\n")
+                written = end
+        if written != num_points:
+            raise ValueError(f"Expected {num_points} points, but got {written}.")
+        vectors.flush()
+        del vectors
+
+        manifest_path = os.path.join(tmp_dir, MANIFEST_FILE)
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        # Write to a temporary file first, so that a partially written snapshot
+        # never appears at 'path'.
+        partial_path = f"{path}.partial"
+        with tarfile.open(partial_path, "w") as tar:
+            tar.add(manifest_path, arcname=MANIFEST_FILE)
+            tar.add(vectors_path, arcname=VECTORS_FILE)
+            tar.add(payloads_path, arcname=PAYLOADS_FILE)
+            for name in sorted(os.listdir(chunks_dir)):
+                tar.add(os.path.join(chunks_dir, name), arcname=f"{CHUNKS_DIR}/{name}")
+        os.replace(partial_path, path)
+
+
+class Snapshot:
+    """Read-only view of a snapshot file.  Vectors are memory-mapped from the file,
+    and payloads are streamed, so neither is loaded into memory all at once.
+
+    Raises:
+        ValueError: If the file is not a valid snapshot.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._tar = tarfile.open(path, "r:")
+        try:
+            self._members = {member.name: member for member in self._tar.getmembers()}
+            for name in [MANIFEST_FILE, VECTORS_FILE, PAYLOADS_FILE]:
+                if name not in self._members:
+                    raise ValueError(f"Snapshot '{path}' is missing '{name}'.")
+            self.manifest = cast(
+                SnapshotManifest, json.load(self._extract(MANIFEST_FILE))
+            )
+        except Exception:
+            self._tar.close()
+            raise
+
+    def _extract(self, name: str):
+        file = self._tar.extractfile(self._members[name])
+        if file is None:
+            raise ValueError(f"Snapshot member '{name}' is not a regular file.")
+        return file
+
+    def vectors(self) -> np.ndarray:
+        """Memory-map the vectors directly from the (uncompressed) snapshot file."""
+        member = self._members[VECTORS_FILE]
+        with open(self.path, "rb") as f:
+            f.seek(member.offset_data)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            offset = f.tell()
+
+        vectors = np.memmap(
+            self.path,
+            dtype=dtype,
+            mode="r",
+            offset=offset,
+            shape=shape,
+            order="F" if fortran_order else "C",
+        )
+        expected = (self.manifest["num_points"], self.manifest["embedding_dim"])
+        if vectors.shape != expected:
+            raise ValueError(
+                f"Expected vectors with shape {expected}, but got {vectors.shape}."
+            )
+        return vectors
+
+    def payloads(self) -> Iterator[Dict[str, Any]]:
+        """Stream the payload of each point, in the same order as 'vectors'."""
+        for line in self._extract(PAYLOADS_FILE):
+            yield json.loads(line)
+
+    def chunk_files(self) -> List[str]:
+        """Names of the chunk store files in the snapshot."""
+        prefix = f"{CHUNKS_DIR}/"
+        return [
+            name[len(prefix) :]
+            for name, member in self._members.items()
+            if name.startswith(prefix) and member.isfile()
+        ]
+
+    def copy_chunks(self, directory: str) -> None:
+        """Copy the chunk store files into 'directory'."""
+        for name in self.chunk_files():
+            # Never write outside of 'directory', whatever the member name is.
+            if os.path.basename(name) != name or not name.endswith(".txt"):
+                raise ValueError(f"Invalid chunk file name in snapshot: '{name}'.")
+            with self._extract(f"{CHUNKS_DIR}/{name}") as src:
+                with open(os.path.join(directory, name), "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+
+    def close(self) -> None:
+        self._tar.close()
+
+    def __enter__(self) -> Snapshot:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def create_manifest(
+    embedding_model: str,
+    embedding_dim: int,
+    chunk_size: int,
+    chunk_overlap: int,
+    num_points: int = 0,
+) -> SnapshotManifest:
+    return SnapshotManifest(
+        format_version=SNAPSHOT_FORMAT_VERSION,
+        document_rag_version=VERSION,
+        embedding_model=embedding_model,
+        embedding_dim=embedding_dim,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        num_points=num_points,
+    )
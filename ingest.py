@@ -0,0 +1,129 @@
+import os
+
+from document_rag.embedder import load_embedder
+from document_rag.embedder.precomputed import (
+    embed_pdf_documents,
+    load_embeddings,
+    save_embeddings,
+)
+from document_rag.profiling import IngestProfiler
+from document_rag.settings import Settings
+from document_rag.vector_db import create_vector_db
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Embed PDF documents offline (e.g. on a batch node), import "
+        "previously saved embeddings into the vector DB, or export/restore snapshots "
+        "of the whole vector DB."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    embed_parser = subparsers.add_parser(
+        "embed", help="Extract and embed PDF documents, and save them to a file."
+    )
+    embed_parser.add_argument(
+        "documents",
+        type=str,
+        nargs="+",
+        help="One or more local paths to PDF documents.",
+    )
+    embed_parser.add_argument(
+        "--output", type=str, required=True, help="Path of the '.npz' file to save."
+    )
+    embed_parser.add_argument(
+        "--profile-ingest",
+        action="store_true",
+        help="Profile ingestion of each document (time, memory, slowest and "
+        "expensive pages), and print a report.",
+    )
+    embed_parser.add_argument(
+        "--profile-dir",
+        type=str,
+        default=None,
+        help="If given with --profile-ingest, also save the report as JSON and "
+        "cProfile stats for each document to this directory.",
+    )
+    import_parser = subparsers.add_parser(
+        "import", help="Add saved embeddings to the vector DB."
+    )
+    import_parser.add_argument(
+        "embeddings",
+        type=str,
+        nargs="+",
+        help="One or more '.npz' files saved by the 'embed' command.",
+    )
+    export_parser = subparsers.add_parser(
+        "export", help="Export the vector DB to a snapshot file."
+    )
+    export_parser.add_argument(
+        "--output", type=str, required=True, help="Path of the snapshot to save."
+    )
+    restore_parser = subparsers.add_parser(
+        "restore", help="Add the contents of a snapshot file to the vector DB."
+    )
+    restore_parser.add_argument(
+        "snapshot", type=str, help="Path of a snapshot saved by the 'export' command."
+    )
+    args = parser.parse_args()
+
+    settings = Settings()
+    if args.command == "embed":
+        for path in args.documents:
+            _, ext = os.path.splitext(path)
+            if not os.path.exists(path):
+                print(f"File '{path}' does not exist.")
+                exit(1)
+            if not ext.lower() == ".pdf":
+                print(
+                    f"File extension '{ext}' for '{path}' not supported. Must be PDF."
+                )
+                exit(1)
+
+    # Only the embedder is needed, to embed documents or to check that the vector DB
+    # was built with the same model.  The LLM and ranker are never loaded.
+    embedder = load_embedder(
+        type=settings.DOCUMENT_RAG_EMBEDDER_TYPE,
+        model=settings.DOCUMENT_RAG_EMBEDDER_MODEL,
+        batch_size=settings.DOCUMENT_RAG_EMBEDDER_BATCH_SIZE,
+        workers=settings.DOCUMENT_RAG_EMBEDDER_WORKERS,
+    )
+    if args.command == "embed":
+        profiler = (
+            IngestProfiler(profile_dir=args.profile_dir)
+            if args.profile_ingest
+            else None
+        )
+        precomputed = embed_pdf_documents(
+            args.documents, embedder, verbose=True, profiler=profiler
+        )
+        save_embeddings(args.output, precomputed)
+        if profiler is not None:
+            print(profiler.format_report())
+            if args.profile_dir is not None:
+                profiler.save(os.path.join(args.profile_dir, "ingest_profile.json"))
+        print(f"Saved {len(precomputed['documents'])} embeddings to '{args.output}'.")
+    else:
+        vector_db = create_vector_db(
+            type=settings.DOCUMENT_RAG_VECTOR_DB_TYPE,
+            cache_dir=settings.DOCUMENT_RAG_VECTOR_DB_CACHE_DIR,
+            exist_ok=True,
+            embedder=embedder,
+        )
+        if args.command == "import":
+            for path in args.embeddings:
+                precomputed = load_embeddings(path)
+                vector_db.add_embeddings(
+                    precomputed["documents"],
+                    precomputed["embeddings"],
+                    model=precomputed["model"],
+                    chunk_size=precomputed["chunk_size"],
+                    chunk_overlap=precomputed["chunk_overlap"],
+                )
+                print(f"Imported embeddings from '{path}'.")
+        elif args.command == "export":
+            vector_db.export_snapshot(args.output)
+            print(f"Exported snapshot to '{args.output}'.")
+        else:
+            vector_db.import_snapshot(args.snapshot)
+            print(f"Restored snapshot from '{args.snapshot}'.")
@@ -0,0 +1,128 @@
+"""Load test for the HTTP server in 'document_rag/server.py'.
+
+By default, this starts a server in-process, with the LLM replaced by a FakeLLM.
+That way, we measure the overhead of retrieval, ranking and serving -- without
+incurring charges from an LLM API.  Pass '--url' to test an existing server instead.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from document_rag.llm.fake import FakeLLM
+from document_rag.rag import RAG
+from document_rag.server import RAGServer
+from document_rag.settings import Settings
+
+
+def send_query(
+    url: str, prompt: str, stream: bool = False, timeout: Optional[float] = None
+) -> Tuple[int, float]:
+    """Send a single query, and return the (HTTP status, latency in seconds)."""
+    endpoint = f"{url}/query/stream" if stream else f"{url}/query"
+    data = json.dumps({"prompt": prompt, "timeout": timeout}).encode("utf-8")
+    request = urllib.request.Request(
+        endpoint, data=data, headers={"Content-Type": "application/json"}
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except urllib.error.URLError:
+        status = 0
+    return status, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--url",
+        type=str,
+        default=None,
+        help="URL of a running server. If not given, a server is started in-process.",
+    )
+    parser.add_argument(
+        "--documents",
+        type=str,
+        nargs="+",
+        default=["assets/alice-in-wonderland.pdf"],
+        help="PDF documents to ingest into the in-process server.",
+    )
+    parser.add_argument("--prompt", type=str, default="What is Alice's cat's name?")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument(
+        "--timeout", type=float, default=None, help="Per-query latency budget."
+    )
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=0.5,
+        help="Simulated generation time of the in-process FakeLLM, in seconds.",
+    )
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=16)
+    args = parser.parse_args()
+
+    server: Optional[RAGServer] = None
+    url = args.url
+    if url is None:
+        # Use a throwaway vector DB, and never construct a real (billed) LLM.
+        cache_dir = tempfile.mkdtemp()
+        settings = Settings(
+            DOCUMENT_RAG_LLM_TYPE="fake",
+            DOCUMENT_RAG_VECTOR_DB_CACHE_DIR=os.path.join(cache_dir, "vector_db"),
+        )
+        rag = RAG.from_settings(settings)
+        rag.llm = FakeLLM(latency=args.llm_latency)
+        rag.add_pdf_documents(paths=args.documents, verbose=True)
+        server = RAGServer(
+            ("127.0.0.1", 0),
+            rag=rag,
+            threads=args.threads,
+            queue_size=args.queue_size,
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results: List[Tuple[int, float]] = list(
+            pool.map(
+                lambda _: send_query(url, args.prompt, args.stream, args.timeout),
+                range(args.requests),
+            )
+        )
+    elapsed = time.perf_counter() - start
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    ok_latencies = np.array([latency for status, latency in results if status == 200])
+    num_rejected = sum(status == 503 for status, _ in results)
+    num_failed = len(results) - len(ok_latencies) - num_rejected
+    print(f"Requests:    {len(results)} ({args.concurrency} concurrent)")
+    print(f"Succeeded:   {len(ok_latencies)}")
+    print(f"Rejected:    {num_rejected} (503, queue full)")
+    print(f"Failed:      {num_failed}")
+    print(f"Throughput:  {len(ok_latencies) / elapsed:.2f} req/s")
+    if len(ok_latencies) > 0:
+        p50, p90, p99 = np.percentile(ok_latencies, [50, 90, 99])
+        print(f"Latency:     p50={p50:.3f}s  p90={p90:.3f}s  p99={p99:.3f}s")
@@ -0,0 +1,75 @@
+import os
+import shutil
+
+from document_rag.rag import RAG
+from document_rag.server import serve
+from document_rag.settings import Settings
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "documents",
+        type=str,
+        nargs="*",
+        help="Zero or more local paths to PDF documents, ingested before serving.",
+    )
+    parser.add_argument(
+        "--snapshot",
+        type=str,
+        default=None,
+        help="Path to a vector DB snapshot (see 'ingest.py export'), loaded before "
+        "serving.  Much faster than ingesting the original documents.",
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes. If greater than 1, the '/ingest' endpoint "
+        "is disabled, and all documents must be passed on the command line.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=4,
+        help="Number of request-handling threads per worker.",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=16,
+        help="Maximum number of queued requests per worker, before new requests "
+        "are rejected with '503 Service Unavailable'.",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    args = parser.parse_args()
+
+    for path in args.documents:
+        _, ext = os.path.splitext(path)
+        if not os.path.exists(path):
+            print(f"File '{path}' does not exist.")
+            exit(1)
+        if not ext.lower() == ".pdf":
+            print(f"File extension '{ext}' for '{path}' not supported. Must be PDF.")
+            exit(1)
+
+    shutil.rmtree(Settings().DOCUMENT_RAG_VECTOR_DB_CACHE_DIR, ignore_errors=True)
+    rag = RAG.from_settings()
+    if args.snapshot:
+        rag.import_snapshot(args.snapshot)
+    if args.documents:
+        rag.add_pdf_documents(paths=args.documents, verbose=True)
+
+    print(f"Serving on http://{args.host}:{args.port}")
+    serve(
+        rag,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        threads=args.threads,
+        queue_size=args.queue_size,
+        verbose=args.verbose,
+    )
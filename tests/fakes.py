@@ -0,0 +1,56 @@
+"""Lightweight models for tests, which don't download any weights."""
+
+import time
+import zlib
+from typing import List, Sequence
+
+import numpy as np
+
+from document_rag.embedder import BaseEmbedder
+from document_rag.ranker import BaseRanker
+
+
+class HashingEmbedder(BaseEmbedder):
+    """Bag-of-words embeddings, hashed into a small number of buckets."""
+
+    def __init__(self, model: str = "hashing", dim: int = 64):
+        self.model = model
+        self.dim = dim
+
+    def embed_documents(
+        self, documents: Sequence[str], verbose: bool = False
+    ) -> np.ndarray:
+        vectors = np.zeros((len(documents), self.dim), dtype=np.float32)
+        for i, text in enumerate(documents):
+            for word in text.lower().split():
+                vectors[i, zlib.crc32(word.encode("utf-8")) % self.dim] += 1
+        return vectors
+
+    def embed_query(self, query: str) -> np.ndarray:
+        # Avoid all-zero vectors, which have no defined cosine similarity.
+        return self.embed_documents([query])[0] + 1e-3
+
+
+class WordOverlapRanker(BaseRanker):
+    def __init__(self):
+        self.num_predictions = 0
+
+    def predict(self, query: str, documents: Sequence[str]) -> List[float]:
+        self.num_predictions += len(documents)
+        words = set(query.lower().split())
+        return [float(len(words & set(doc.lower().split()))) for doc in documents]
+
+
+class SlowRanker(WordOverlapRanker):
+    """Ranker that takes a fixed amount of time per document."""
+
+    def __init__(self, seconds_per_document: float):
+        super().__init__()
+        self.seconds_per_document = seconds_per_document
+        # Number of documents in each call to 'predict'.
+        self.batch_sizes: List[int] = []
+
+    def predict(self, query: str, documents: Sequence[str]) -> List[float]:
+        self.batch_sizes.append(len(documents))
+        time.sleep(self.seconds_per_document * len(documents))
+        return super().predict(query, documents)
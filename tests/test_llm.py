@@ -1,9 +1,19 @@
-from typing import Optional, Type
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, Optional, Type
 
 import pytest
+from openai import APITimeoutError, InternalServerError
 
 from document_rag.llm import BaseLLM, load_llm
+from document_rag.llm.fake import FakeLLM
 from document_rag.llm.huggingface import HuggingFaceLLM
+from document_rag.llm.openai import OpenAILLM
+from document_rag.llm.transport import SingleFlight
+from document_rag.settings import Settings
 
 
 @pytest.mark.parametrize(
@@ -13,6 +23,7 @@ from document_rag.llm.huggingface import HuggingFaceLLM
         ("openai", "model-does-not-exist", ValueError),
         ("huggingface", "distilgpt2", None),
         ("huggingface", "model-does-not-exist", OSError),  # error from HF backend
+        ("fake", "fake", None),
         ("unsupported-type", "distilgpt2", ValueError),
     ],
 )
@@ -36,3 +47,209 @@ def llm() -> HuggingFaceLLM:
 
 def test_generate(llm: BaseLLM):
     _ = llm.generate(prompt="Respond with just the word STOP.")
+
+
+def test_fake_llm_stream():
+    llm = FakeLLM(response="Alice was beginning to get very tired")
+    assert llm.generate(prompt="Who is tired?") == llm.response
+    assert "".join(llm.stream(prompt="Who is tired?")) == llm.response
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible chat completions endpoint."""
+
+    server: "MockOpenAIServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.num_requests += 1
+            fail = self.server.num_failures > 0
+            self.server.num_failures -= 1
+        time.sleep(self.server.delay)
+
+        if fail:
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for content in ["Di", "nah"]:
+                chunk = {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": body["model"],
+                    "choices": [
+                        {
+                            "index": 0,
+                            "finish_reason": None,
+                            "delta": {"content": content},
+                        }
+                    ],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+            return
+
+        data = json.dumps(
+            {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": "Dinah"},
+                    }
+                ],
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), MockOpenAIHandler)
+        self.lock = threading.Lock()
+        self.num_requests = 0
+        self.num_failures = 0
+        self.delay = 0.0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+@pytest.fixture
+def openai_server() -> Iterator[MockOpenAIServer]:
+    server = MockOpenAIServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_openai_generate(openai_server: MockOpenAIServer):
+    llm = OpenAILLM(model="gpt-3.5-turbo", base_url=openai_server.base_url)
+    assert llm.generate(prompt="What is Alice's cat's name?") == "Dinah"
+    assert openai_server.num_requests == 1
+
+
+def test_openai_retries(openai_server: MockOpenAIServer):
+    llm = OpenAILLM(
+        model="gpt-3.5-turbo",
+        base_url=openai_server.base_url,
+        max_retries=2,
+        retry_backoff=0.01,
+    )
+    openai_server.num_failures = 2
+    assert llm.generate(prompt="What is Alice's cat's name?") == "Dinah"
+    assert openai_server.num_requests == 3
+
+    openai_server.num_failures = 3
+    with pytest.raises(InternalServerError):
+        llm.generate(prompt="What is Alice's cat's name?")
+
+
+def test_openai_stream_retries(openai_server: MockOpenAIServer):
+    llm = OpenAILLM(
+        model="gpt-3.5-turbo",
+        base_url=openai_server.base_url,
+        max_retries=2,
+        retry_backoff=0.01,
+    )
+    openai_server.num_failures = 2
+    assert "".join(llm.stream(prompt="What is Alice's cat's name?")) == "Dinah"
+    assert openai_server.num_requests == 3
+
+
+def test_load_llm_transport_settings(openai_server: MockOpenAIServer):
+    settings = Settings(
+        OPENAI_API_KEY="not-a-real-key",
+        OPENAI_BASE_URL=openai_server.base_url,
+        DOCUMENT_RAG_LLM_MAX_RETRIES=0,
+    )
+    llm = load_llm(type="openai", model="gpt-3.5-turbo", settings=settings)
+    assert isinstance(llm, OpenAILLM)
+    assert llm.client.api_key == "not-a-real-key"
+    assert llm.generate(prompt="What is Alice's cat's name?") == "Dinah"
+
+    openai_server.num_failures = 1
+    with pytest.raises(InternalServerError):
+        llm.generate(prompt="What is Alice's cat's name?")
+    assert openai_server.num_requests == 2
+
+
+def test_openai_timeout(openai_server: MockOpenAIServer):
+    llm = OpenAILLM(
+        model="gpt-3.5-turbo", base_url=openai_server.base_url, retry_backoff=0.01
+    )
+    openai_server.delay = 1.0
+    start = time.monotonic()
+    with pytest.raises(APITimeoutError):
+        llm.generate(prompt="What is Alice's cat's name?", timeout=0.2)
+    assert time.monotonic() - start < 1.0
+
+
+def test_openai_singleflight(openai_server: MockOpenAIServer):
+    llm = OpenAILLM(model="gpt-3.5-turbo", base_url=openai_server.base_url)
+    openai_server.delay = 0.5
+    prompts = ["What is Alice's cat's name?"] * 8 + ["Who is the Mad Hatter?"] * 8
+    with ThreadPoolExecutor(max_workers=len(prompts)) as pool:
+        responses = list(pool.map(lambda p: llm.generate(prompt=p), prompts))
+    assert responses == ["Dinah"] * len(prompts)
+    assert openai_server.num_requests == 2
+
+
+def test_openai_singleflight_follower_timeout(openai_server: MockOpenAIServer):
+    llm = OpenAILLM(model="gpt-3.5-turbo", base_url=openai_server.base_url)
+    openai_server.delay = 2.0
+    prompt = "What is Alice's cat's name?"
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(llm.generate, prompt, 60.0)
+        while llm._singleflight.in_flight() == 0:
+            time.sleep(0.01)
+        start = time.monotonic()
+        with pytest.raises(TimeoutError):
+            llm.generate(prompt, timeout=0.5)
+        assert time.monotonic() - start < 1.5
+        assert leader.result() == "Dinah"
+    assert openai_server.num_requests == 1
+
+
+def test_singleflight_error():
+    singleflight: SingleFlight[str] = SingleFlight()
+    started = threading.Event()
+
+    def fail() -> str:
+        started.set()
+        time.sleep(0.2)
+        raise RuntimeError("upstream failed")
+
+    def call() -> Optional[str]:
+        try:
+            return singleflight.do("key", fail)
+        except RuntimeError:
+            return None
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(call)
+        started.wait()
+        followers = [pool.submit(call) for _ in range(3)]
+        assert leader.result() is None
+        assert all(follower.result() is None for follower in followers)
+    assert singleflight.in_flight() == 0
@@ -0,0 +1,76 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+from document_rag.embedder.precomputed import embed_pdf_documents
+from document_rag.profiling import IngestProfiler
+from document_rag.vector_db.base import read_pdf_document
+from document_rag.vector_db.qdrant import QdrantVectorDB
+from tests.fakes import HashingEmbedder
+
+PATH = "assets/alice-in-wonderland-short.pdf"
+
+
+def test_add_pdf_documents(tmp_path):
+    db = QdrantVectorDB.create(str(tmp_path / "db"), embedder=HashingEmbedder())
+    profiler = IngestProfiler(slowest_pages=2, profile_dir=str(tmp_path / "profile"))
+    db.add_pdf_documents([PATH], profiler=profiler)
+
+    (profile,) = profiler.profiles
+    assert profile["chunks"] == len(read_pdf_document(PATH))
+    assert profile["chunks"] == db.client.count("documents").count
+    assert profile["pages"] > 0
+    assert profile["pages_per_second"] > 0
+    assert set(profile["stages"]) == {"extract", "chunk", "index"}
+    assert len(profile["slowest_pages"]) == 2
+    assert profile["cprofile_path"] is not None
+    assert os.path.exists(profile["cprofile_path"])
+
+    profiler.save(str(tmp_path / "profile" / "ingest_profile.json"))
+    with open(tmp_path / "profile" / "ingest_profile.json") as f:
+        saved = json.load(f)[0]
+    assert saved["path"] == PATH
+    assert saved["cprofile_path"] == profile["cprofile_path"]
+    assert PATH in profiler.format_report()
+
+
+def test_cprofile_paths(tmp_path):
+    # Files with the same name, in different directories, get separate stats.
+    paths = []
+    for name in ["a", "b"]:
+        (tmp_path / name).mkdir()
+        shutil.copy(PATH, tmp_path / name / "doc.pdf")
+        paths.append(str(tmp_path / name / "doc.pdf"))
+    profiler = IngestProfiler(profile_dir=str(tmp_path / "profile"))
+    embed_pdf_documents(paths, HashingEmbedder(), profiler=profiler)
+
+    cprofile_paths = [profile["cprofile_path"] for profile in profiler.profiles]
+    assert len(set(cprofile_paths)) == 2
+    assert all(path is not None and os.path.exists(path) for path in cprofile_paths)
+
+
+def test_embed_pdf_documents():
+    embedder = HashingEmbedder()
+    profiler = IngestProfiler()
+    precomputed = embed_pdf_documents([PATH], embedder, profiler=profiler)
+    expected = embed_pdf_documents([PATH], embedder)
+    np.testing.assert_array_equal(precomputed["embeddings"], expected["embeddings"])
+    assert set(profiler.profiles[0]["stages"]) == {"extract", "chunk", "embed"}
+
+
+def test_expensive_pages():
+    profiler = IngestProfiler(slow_min_seconds=0.5)
+    with profiler.profile_file("doc.pdf"):
+        for i in range(10):
+            profiler.record_page(i, seconds=0.01, text="word " * 100, images=0)
+        profiler.record_page(10, seconds=0.01, text="", images=1)
+        profiler.record_page(11, seconds=0.01, text="word " * 100, images=20)
+        profiler.record_page(12, seconds=1.0, text="word " * 100, images=0)
+
+    (profile,) = profiler.profiles
+    reasons = {page["page"]: page["reasons"] for page in profile["expensive_pages"]}
+    assert reasons == {10: ["scanned"], 11: ["image_heavy"], 12: ["slow"]}
+    assert profile["slowest_pages"][0]["page"] == 12
+    assert profile["cprofile_path"] is None
@@ -0,0 +1,78 @@
+"""Deadline tests for 'RAG.generate', which run offline with fake models."""
+
+import time
+from typing import Iterator, List, cast
+
+import pytest
+
+from document_rag.llm.fake import FakeLLM
+from document_rag.rag import RAG, Degradation
+from document_rag.vector_db.qdrant import QdrantVectorDB
+from tests.fakes import HashingEmbedder, SlowRanker
+
+PROMPT = "What is the name of Alice's cat?"
+
+
+@pytest.fixture
+def rag(tmp_path) -> Iterator[RAG]:
+    vector_db = QdrantVectorDB.create(str(tmp_path / "db"), embedder=HashingEmbedder())
+    vector_db.add_pdf_documents(["assets/alice-in-wonderland-short.pdf"])
+    yield RAG(
+        llm=FakeLLM(response="Dinah"),
+        ranker=SlowRanker(seconds_per_document=0.02),
+        vector_db=vector_db,
+        retriever_chunks=20,
+        ranker_chunks=3,
+    )
+
+
+def batch_sizes(rag: RAG) -> List[int]:
+    return cast(SlowRanker, rag.ranker).batch_sizes
+
+
+def test_generate_with_timeout(rag: RAG):
+    result = rag.generate(PROMPT, timeout=60.0)
+    assert result["degradations"] == [Degradation.CAPPED_LLM_TIME]
+    assert batch_sizes(rag) == [rag.retriever_chunks]
+    assert len(result["search_results"]) == rag.ranker_chunks
+
+
+def test_generate_with_timeout_reduces_retriever_chunks(rag: RAG):
+    # Half of 0.5 seconds is enough to rank ~12 of the 20 chunks.
+    rag.ranker_seconds_per_chunk = 0.02
+    result = rag.generate(PROMPT, timeout=0.5)
+    assert Degradation.REDUCED_RETRIEVER_CHUNKS in result["degradations"]
+    assert Degradation.SKIPPED_RANKER not in result["degradations"]
+    assert 0 < batch_sizes(rag)[0] < rag.retriever_chunks
+
+
+def test_generate_with_timeout_reduces_ranker_chunks(monkeypatch, rag: RAG):
+    # Enough time to rank all 20 chunks before retrieval, but slow retrieval uses
+    # up part of the budget.
+    rag.ranker_seconds_per_chunk = 0.02
+    search_results = rag.vector_db.search_results
+
+    def slow_search_results(*args, **kwargs):
+        time.sleep(0.4)
+        return search_results(*args, **kwargs)
+
+    monkeypatch.setattr(rag.vector_db, "search_results", slow_search_results)
+    result = rag.generate(PROMPT, timeout=1.0)
+    assert Degradation.REDUCED_RETRIEVER_CHUNKS not in result["degradations"]
+    assert Degradation.REDUCED_RANKER_CHUNKS in result["degradations"]
+    assert Degradation.SKIPPED_RANKER not in result["degradations"]
+    assert 0 < batch_sizes(rag)[0] < rag.retriever_chunks
+    assert len(result["search_results"]) == rag.ranker_chunks
+
+
+def test_generate_with_timeout_skips_ranker(rag: RAG):
+    rag.ranker_seconds_per_chunk = 10.0
+    result = rag.generate(PROMPT, timeout=5.0)
+    assert Degradation.SKIPPED_RANKER in result["degradations"]
+    assert batch_sizes(rag) == []
+    assert len(result["search_results"]) == rag.ranker_chunks
+
+
+def test_generate_with_expired_timeout(rag: RAG):
+    with pytest.raises(TimeoutError):
+        rag.generate(PROMPT, timeout=0.0)
@@ -0,0 +1,242 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Tuple
+
+import httpx
+import pytest
+from openai import APITimeoutError
+
+from document_rag.llm.fake import FakeLLM
+from document_rag.rag import RAG
+from document_rag.server import RAGServer, _ReadWriteLock
+from document_rag.vector_db.qdrant import QdrantVectorDB
+from tests.fakes import HashingEmbedder, WordOverlapRanker
+
+
+@pytest.fixture
+def server(tmp_path) -> Iterator[RAGServer]:
+    rag = RAG(
+        llm=FakeLLM(response="Dinah", latency=0.2),
+        ranker=WordOverlapRanker(),
+        vector_db=QdrantVectorDB.create(
+            str(tmp_path / "db"), embedder=HashingEmbedder()
+        ),
+    )
+    server = RAGServer(("127.0.0.1", 0), rag=rag, threads=2, queue_size=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server: RAGServer, path: str, body: Dict[str, Any]) -> Tuple[int, bytes]:
+    url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+    request = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"))
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    except (urllib.error.URLError, ConnectionError):
+        # The connection was closed without a response.
+        return 0, b""
+
+
+def test_health(server: RAGServer):
+    url = f"http://127.0.0.1:{server.server_address[1]}/health"
+    with urllib.request.urlopen(url) as response:
+        assert json.loads(response.read()) == {"status": "ok"}
+
+
+def test_ingest_and_query(server: RAGServer):
+    status, _ = post(server, "/query", {"prompt": "What is Alice's cat's name?"})
+    assert status == 400  # The DB is empty.
+
+    paths = ["assets/alice-in-wonderland-short.pdf"]
+    status, _ = post(server, "/ingest", {"paths": paths})
+    assert status == 200
+    status, _ = post(server, "/ingest", {"paths": ["assets/does-not-exist.pdf"]})
+    assert status == 400
+
+    status, body = post(server, "/query", {"prompt": "What is Alice's cat's name?"})
+    assert status == 200
+    result = json.loads(body)
+    assert result["text"] == "Dinah"
+    assert len(result["search_results"]) == server.rag.ranker_chunks
+
+    status, body = post(
+        server, "/query/stream", {"prompt": "What is Alice's cat's name?"}
+    )
+    assert status == 200
+    lines = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+    assert "search_results" in lines[0]
+    assert "".join(line["text"] for line in lines[1:]) == "Dinah"
+
+
+def test_query_releases_lock_before_llm(server: RAGServer):
+    paths = ["assets/alice-in-wonderland-short.pdf"]
+    assert post(server, "/ingest", {"paths": paths})[0] == 200
+    server.rag.llm = FakeLLM(response="Dinah", latency=2.0)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        query = pool.submit(post, server, "/query", {"prompt": "Who is Dinah?"})
+        time.sleep(0.5)  # Retrieval is done, and the query is waiting for the LLM.
+        start = time.monotonic()
+        assert post(server, "/ingest", {"paths": paths})[0] == 200
+        assert time.monotonic() - start < 1.5
+        assert query.result()[0] == 200
+
+
+def test_read_write_lock_prefers_writers():
+    lock = _ReadWriteLock()
+    lock.acquire_read()
+    events: List[str] = []
+
+    def write():
+        lock.acquire_write()
+        events.append("write")
+        lock.release_write()
+
+    def read():
+        lock.acquire_read()
+        events.append("read")
+        lock.release_read()
+
+    writer = threading.Thread(target=write, daemon=True)
+    writer.start()
+    time.sleep(0.1)
+    # A writer is waiting, so new readers wait behind it.
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    time.sleep(0.1)
+    try:
+        assert events == []
+    finally:
+        lock.release_read()
+    writer.join(timeout=5)
+    reader.join(timeout=5)
+    assert events == ["write", "read"]
+
+
+def test_ingest_disabled(server: RAGServer):
+    server.allow_ingest = False
+    status, _ = post(server, "/ingest", {"paths": []})
+    assert status == 403
+
+
+def test_backpressure(server: RAGServer):
+    post(server, "/ingest", {"paths": ["assets/alice-in-wonderland-short.pdf"]})
+    # 2 threads + 2 queue slots, so some of these requests must be rejected.
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        statuses = list(
+            pool.map(
+                lambda _: post(server, "/query", {"prompt": "Alice"})[0], range(16)
+            )
+        )
+    assert 200 in statuses
+    assert 503 in statuses
+    # Some connections may be closed without a response, if too many requests
+    # are being rejected at once.
+    assert set(statuses) <= {200, 503, 0}
+
+
+def test_backpressure_bounded_rejectors(server: RAGServer):
+    post(server, "/ingest", {"paths": ["assets/alice-in-wonderland-short.pdf"]})
+    # Use up the only rejector slot, so overflowing connections are closed
+    # immediately instead of getting a thread each.
+    server._rejectors = threading.BoundedSemaphore(1)
+    server._rejectors.acquire()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        statuses = list(
+            pool.map(
+                lambda _: post(server, "/query", {"prompt": "Alice"})[0], range(16)
+            )
+        )
+    assert 200 in statuses
+    assert 0 in statuses
+    assert 503 not in statuses
+
+
+def test_errors(server: RAGServer, monkeypatch):
+    post(server, "/ingest", {"paths": ["assets/alice-in-wonderland-short.pdf"]})
+    for body in [{"prompt": 1}, {"prompt": "Alice", "timeout": "5"}, {}]:
+        status, response = post(server, "/query", body)
+        assert status == 400
+        assert "error" in json.loads(response)
+
+    def timeout(*args, **kwargs):
+        raise APITimeoutError(request=httpx.Request("POST", "http://localhost"))
+
+    monkeypatch.setattr(server.rag.llm, "generate", timeout)
+    status, response = post(server, "/query", {"prompt": "Alice"})
+    assert status == 504
+    assert "error" in json.loads(response)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("LLM is down")
+
+    monkeypatch.setattr(server.rag.llm, "generate", fail)
+    status, response = post(server, "/query", {"prompt": "Alice"})
+    assert status == 500
+    assert "error" in json.loads(response)
+
+
+SERVE_SCRIPT = """
+import sys
+from document_rag.llm.fake import FakeLLM
+from document_rag.rag import RAG
+from document_rag.server import serve
+from document_rag.vector_db.qdrant import QdrantVectorDB
+from tests.fakes import HashingEmbedder, WordOverlapRanker
+
+vector_db = QdrantVectorDB.create(sys.argv[1], embedder=HashingEmbedder())
+rag = RAG(llm=FakeLLM(), ranker=WordOverlapRanker(), vector_db=vector_db)
+serve(rag, port=0, workers=2)
+"""
+
+
+def child_pids(pid: int) -> List[int]:
+    children = []
+    for name in os.listdir("/proc"):
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                # The parent PID is the second field after the command name, which
+                # is in parentheses (and may contain spaces).
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid:
+            children.append(int(name))
+    return children
+
+
+@pytest.mark.skipif(not os.path.exists("/proc"), reason="requires /proc")
+def test_serve_workers_stop_on_sigterm(tmp_path):
+    master = subprocess.Popen(
+        [sys.executable, "-c", SERVE_SCRIPT, str(tmp_path / "db")],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    try:
+        deadline = time.monotonic() + 60
+        workers = child_pids(master.pid)
+        while len(workers) < 2 and time.monotonic() < deadline:
+            time.sleep(0.1)
+            workers = child_pids(master.pid)
+        assert len(workers) == 2
+
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=10)
+        deadline = time.monotonic() + 10
+        while any(os.path.exists(f"/proc/{pid}") for pid in workers):
+            assert time.monotonic() < deadline, "Workers still running."
+            time.sleep(0.1)
+    finally:
+        master.kill()
+        master.wait()
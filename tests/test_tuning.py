@@ -0,0 +1,70 @@
+import pytest
+
+from document_rag.tuning import (
+    LabelledQuestion,
+    format_table,
+    load_questions,
+    pareto_front,
+    sweep,
+)
+from tests.fakes import HashingEmbedder, WordOverlapRanker
+
+PATH = "assets/alice-in-wonderland-short.pdf"
+QUESTIONS = [
+    LabelledQuestion(question="What is Alice's cat's name?", pages=[(PATH, 3)]),
+    LabelledQuestion(question="Who was late, and checked a watch?", pages=[(PATH, 1)]),
+]
+
+
+def test_sweep():
+    ranker = WordOverlapRanker()
+    results = sweep(
+        questions=QUESTIONS,
+        paths=[PATH],
+        embedder=HashingEmbedder(),
+        ranker=ranker,
+        chunk_sizes=[32, 64],
+        chunk_overlaps=[0, 32],
+        retriever_chunks=[4, 8],
+        ranker_chunks=[2, 4],
+    )
+    # (32, 32) is skipped, since the overlap must be smaller than the chunk size.
+    assert len(results) == 3 * 2 * 2
+    for result in results:
+        assert 0 <= result["recall"] <= 1
+        assert 0 <= result["ranker_precision"] <= 1
+        assert 0 <= result["hit_rate"] <= 1
+        assert result["parse_seconds"] > 0
+        assert result["index_megabytes"] > 0
+    assert any(result["pareto"] for result in results)
+
+    # Each (question, chunk) pair is scored only once, even though it is ranked
+    # in several configurations.
+    # (3 chunk configs, 2 questions, at most 8 candidates per question)
+    assert ranker.num_predictions <= 3 * 2 * 8
+
+    table = format_table(results, pareto_only=True)
+    assert len(table.splitlines()) == 2 + sum(result["pareto"] for result in results)
+
+
+def test_pareto_front():
+    results = [
+        {"ranker_precision": 0.5, "retriever_seconds": 1.0, "ranker_seconds": 0.0},
+        {"ranker_precision": 0.4, "retriever_seconds": 2.0, "ranker_seconds": 0.0},
+        {"ranker_precision": 0.6, "retriever_seconds": 3.0, "ranker_seconds": 0.0},
+    ]
+    for result in results:
+        result["index_megabytes"] = 1.0
+    assert pareto_front(results) == [True, False, True]  # type: ignore
+
+
+def test_load_questions(tmp_path):
+    path = tmp_path / "questions.json"
+    path.write_text('[{"question": "Who?", "pages": [["doc.pdf", "3"]]}]')
+    assert load_questions(str(path)) == [
+        LabelledQuestion(question="Who?", pages=[("doc.pdf", 3)])
+    ]
+
+    path.write_text('[{"question": "Who?"}]')
+    with pytest.raises(KeyError):
+        load_questions(str(path))
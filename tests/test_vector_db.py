@@ -0,0 +1,252 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from document_rag.embedder.precomputed import (
+    embed_pdf_documents,
+    load_embeddings,
+    save_embeddings,
+)
+from document_rag.vector_db.base import CHUNK_OVERLAP, read_pdf_document
+from document_rag.vector_db.chunk_store import ChunkStore, stored_size
+from document_rag.vector_db.qdrant import QdrantVectorDB
+from document_rag.vector_db.results import SearchResults, top_k_indices
+from document_rag.vector_db.snapshot import Snapshot, create_manifest, write_snapshot
+from tests.fakes import HashingEmbedder
+
+PATH = "assets/alice-in-wonderland-short.pdf"
+
+
+@pytest.mark.parametrize(
+    "chunks",
+    [
+        ["the quick brown", "brown fox jumps", "jumps over the lazy dog"],
+        ["no overlap", "between these", "chunks"],
+        ["repeated repeated", "repeated repeated", "repeated"],
+        ["unicode ‘quotes’ and ﬁ", "and ﬁ ligatures"],
+        ["", "empty", ""],
+    ],
+)
+def test_chunk_store(tmp_path, chunks):
+    store = ChunkStore(str(tmp_path))
+    spans = store.add(chunks)
+    assert store.get_many(spans) == chunks
+    assert store.size() == stored_size(chunks)
+    store.close()
+
+
+def test_chunk_store_deduplicates_overlap(tmp_path):
+    chunks = [text for text, _ in read_pdf_document("assets/alice-in-wonderland.pdf")]
+    store = ChunkStore(str(tmp_path))
+    spans = store.add(chunks)
+    assert store.get_many(spans) == chunks
+
+    # With the default chunk overlap (half of the chunk size), every word would be
+    # stored twice.  The store should keep each word only once.
+    total_size = sum(len(chunk.encode("utf-8")) for chunk in chunks)
+    assert store.size() < 0.6 * total_size
+
+
+def test_qdrant_search(tmp_path):
+    db = QdrantVectorDB.create(str(tmp_path / "db"), embedder=HashingEmbedder())
+    with pytest.raises(ValueError):
+        db.search("What is Alice's cat's name?")
+
+    db.add_pdf_documents([PATH])
+    results = db.search("What is Alice's cat's name?", limit=3)
+    assert len(results) == 3
+    assert all(result["text"] for result in results)
+
+
+def test_qdrant_embedder_mismatch(tmp_path):
+    db = QdrantVectorDB.create(str(tmp_path / "db"), embedder=HashingEmbedder())
+    db.client.close()
+    with pytest.raises(ValueError):
+        QdrantVectorDB.create(
+            str(tmp_path / "db"), exist_ok=True, embedder=HashingEmbedder(model="other")
+        )
+    with pytest.raises(ValueError):
+        QdrantVectorDB.create(
+            str(tmp_path / "db"), exist_ok=True, embedder=HashingEmbedder(dim=32)
+        )
+
+
+def test_qdrant_missing_embedder_record(tmp_path):
+    db = QdrantVectorDB.create(str(tmp_path / "db"), embedder=HashingEmbedder())
+    db.add_pdf_documents([PATH])
+    db.client.close()
+    # E.g. a DB built before the record was kept.
+    os.remove(tmp_path / "db" / "embedder.json")
+    with pytest.raises(ValueError, match="older version"):
+        QdrantVectorDB.create(
+            str(tmp_path / "db"), exist_ok=True, embedder=HashingEmbedder()
+        )
+    # The directory isn't left locked by a client that failed to open.
+    with pytest.raises(ValueError, match="older version"):
+        QdrantVectorDB.create(
+            str(tmp_path / "db"), exist_ok=True, embedder=HashingEmbedder()
+        )
+
+
+def test_qdrant_incomplete_embedder_record(tmp_path):
+    db = QdrantVectorDB.create(str(tmp_path / "db"), embedder=HashingEmbedder())
+    db.client.close()
+    # Every setting must be recorded -- missing ones are never assumed to match.
+    with open(tmp_path / "db" / "embedder.json", "w") as f:
+        json.dump({"model": "hashing", "dim": 64}, f)
+    with pytest.raises(ValueError):
+        QdrantVectorDB.create(
+            str(tmp_path / "db"), exist_ok=True, embedder=HashingEmbedder()
+        )
+
+
+def test_precomputed_embeddings(tmp_path):
+    embedder = HashingEmbedder()
+    precomputed = embed_pdf_documents([PATH], embedder=embedder)
+    save_embeddings(str(tmp_path / "embeddings.npz"), precomputed)
+    loaded = load_embeddings(str(tmp_path / "embeddings.npz"))
+    assert loaded["documents"] == precomputed["documents"]
+    assert loaded["model"] == precomputed["model"]
+    np.testing.assert_array_equal(loaded["embeddings"], precomputed["embeddings"])
+
+    db = QdrantVectorDB.create(str(tmp_path / "db"), embedder=embedder)
+    documents, embeddings = loaded["documents"], loaded["embeddings"]
+    with pytest.raises(ValueError):
+        db.add_embeddings(documents, embeddings, model="other")
+    with pytest.raises(ValueError):
+        db.add_embeddings(documents, embeddings[:, :32], model=loaded["model"])
+
+    db.add_embeddings(documents, embeddings, model=loaded["model"])
+    results = db.search("What is Alice's cat's name?", limit=len(documents))
+    assert sorted(r["text"] for r in results) == sorted(t for t, _ in documents)
+
+
+def test_precomputed_embeddings_chunk_settings(tmp_path):
+    embedder = HashingEmbedder()
+    precomputed = embed_pdf_documents([PATH], embedder=embedder, chunk_size=96)
+    save_embeddings(str(tmp_path / "embeddings.npz"), precomputed)
+    loaded = load_embeddings(str(tmp_path / "embeddings.npz"))
+    assert (loaded["chunk_size"], loaded["chunk_overlap"]) == (96, CHUNK_OVERLAP)
+
+    db = QdrantVectorDB.create(str(tmp_path / "db"), embedder=embedder)
+    with pytest.raises(ValueError):
+        db.add_embeddings(
+            loaded["documents"],
+            loaded["embeddings"],
+            model=loaded["model"],
+            chunk_size=loaded["chunk_size"],
+            chunk_overlap=loaded["chunk_overlap"],
+        )
+
+
+def test_snapshot(tmp_path, monkeypatch):
+    db = QdrantVectorDB.create(str(tmp_path / "db"), embedder=HashingEmbedder())
+    db.add_pdf_documents([PATH])
+    # Stream the export in several batches.
+    monkeypatch.setattr("document_rag.vector_db.qdrant.SNAPSHOT_BATCH_SIZE", 3)
+    db.export_snapshot(str(tmp_path / "snapshot.tar"))
+
+    restored = QdrantVectorDB.create(str(tmp_path / "new"), embedder=HashingEmbedder())
+    restored.import_snapshot(str(tmp_path / "snapshot.tar"))
+    # Compare all points, since chunks with (nearly) tied scores may be returned in
+    # any order.  Scores can differ in the last bits, depending on the index layout.
+    query = "What is Alice's cat's name?"
+    num_points = db.client.count("documents").count
+    expected, actual = (
+        sorted(
+            d.search(query, limit=num_points),
+            key=lambda r: (str(r["metadata"]), r["text"]),
+        )
+        for d in (db, restored)
+    )
+    assert [r["text"] for r in actual] == [r["text"] for r in expected]
+    assert [r["metadata"] for r in actual] == [r["metadata"] for r in expected]
+    assert [r["similarity"] for r in actual] == pytest.approx(
+        [r["similarity"] for r in expected]
+    )
+    # Point IDs are preserved, so importing again doesn't duplicate anything.
+    restored.import_snapshot(str(tmp_path / "snapshot.tar"))
+    assert (
+        restored.client.count("documents").count == db.client.count("documents").count
+    )
+
+    other = QdrantVectorDB.create(
+        str(tmp_path / "other"), embedder=HashingEmbedder(model="other")
+    )
+    with pytest.raises(ValueError):
+        other.import_snapshot(str(tmp_path / "snapshot.tar"))
+
+
+def test_write_snapshot_num_points(tmp_path):
+    manifest = create_manifest(
+        embedding_model="hashing", embedding_dim=4, chunk_size=8, chunk_overlap=2
+    )
+    manifest["num_points"] = 3
+    batches = [(np.ones((2, 4)), [{"id": 0}, {"id": 1}])]
+    (tmp_path / "chunks").mkdir()
+    with pytest.raises(ValueError):
+        write_snapshot(
+            str(tmp_path / "snapshot.tar"), manifest, batches, str(tmp_path / "chunks")
+        )
+    assert not (tmp_path / "snapshot.tar").exists()
+
+
+def test_snapshot_chunk_settings(tmp_path, monkeypatch):
+    db = QdrantVectorDB.create(str(tmp_path / "db"), embedder=HashingEmbedder())
+    db.client.close()
+
+    monkeypatch.setattr("document_rag.vector_db.qdrant.CHUNK_SIZE", 32)
+    with pytest.raises(ValueError):
+        QdrantVectorDB.create(
+            str(tmp_path / "db"), exist_ok=True, embedder=HashingEmbedder()
+        )
+    small = QdrantVectorDB.create(str(tmp_path / "small"), embedder=HashingEmbedder())
+    small.add_pdf_documents([PATH])
+    monkeypatch.undo()
+
+    # The snapshot reports the chunk settings that the DB was built with, not the
+    # ones in the current environment.
+    small.export_snapshot(str(tmp_path / "small.tar"))
+    with Snapshot(str(tmp_path / "small.tar")) as snapshot:
+        assert snapshot.manifest["chunk_size"] == 32
+    restored = QdrantVectorDB.create(str(tmp_path / "new"), embedder=HashingEmbedder())
+    with pytest.raises(ValueError):
+        restored.import_snapshot(str(tmp_path / "small.tar"))
+
+
+@pytest.mark.parametrize("k", [0, 1, 5, 20, 100])
+def test_top_k_indices(k):
+    scores = np.random.default_rng(k).normal(size=20)
+    expected = np.argsort(scores)[::-1][:k]
+    np.testing.assert_array_equal(top_k_indices(scores, k), expected)
+
+
+def test_search_results(tmp_path, monkeypatch):
+    db = QdrantVectorDB.create(str(tmp_path / "db"), embedder=HashingEmbedder())
+    db.add_pdf_documents([PATH])
+    query = "What is Alice's cat's name?"
+    results = db.search_results(query, limit=10)
+    assert results.to_list() == db.search(query, limit=10)
+    assert SearchResults.from_list(db.search(query, limit=10)).to_list() == (
+        results.to_list()
+    )
+
+    # Text is only loaded for the selected results, and only once.
+    loaded = []
+    get_many = db.chunk_store.get_many
+
+    def text_loader(spans):
+        loaded.extend(spans)
+        return get_many(spans)
+
+    monkeypatch.setattr(db.chunk_store, "get_many", text_loader)
+    results = db.search_results(query, limit=10)
+    top = results.take(np.array([3, 1]), scores=np.array([2.0, 1.0]))
+    assert loaded == []
+    top_list = top.to_list()
+    assert [r["similarity"] for r in top_list] == [2.0, 1.0]
+    assert len(loaded) == 2
+    assert [r["text"] for r in top_list] == [results.texts()[3], results.texts()[1]]
+    assert len(loaded) == 10